@@ -6,24 +6,112 @@ Fixes all Gradio warnings, port conflicts, and missing dependencies
 
 import gradio as gr
 import requests
+import codecs
 import json
+import re
 import time
 import logging
 import os
+import socket
 import hashlib
 import subprocess
+import uuid
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, Iterator
 from pathlib import Path
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Configuration
 API_BASE = "http://localhost:8000"
+HEALTH_CHECK_TTL = 5.0  # seconds to reuse the last /health probe result
+MAX_CTX_TURNS = 8  # exchanges sent to the backend as chat context
 UPLOAD_DIR = Path("./data/documents")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Interface CSS/JS live in static files so the browser can cache them
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+# Gradio 5 moved the file route under /gradio_api
+STATIC_FILE_ROUTE = "/gradio_api/file=" if int(gr.__version__.split(".")[0]) >= 5 else "/file="
+STATIC_HEAD = (
+    f'<link rel="stylesheet" href="{STATIC_FILE_ROUTE}{(STATIC_DIR / "ultimate.css").as_posix()}">'
+    f'<script src="{STATIC_FILE_ROUTE}{(STATIC_DIR / "ultimate.js").as_posix()}"></script>'
+)
+# Runs after Gradio has mounted the components; ultimate.js also starts
+# itself in case it loads after this hook
+STATIC_INIT_JS = "() => { window.initUltimateInterface && window.initUltimateInterface(); }"
+
+# Shared HTTP session - keep-alive + connection pooling for all backend calls
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+def _api(method: str, path: str, **kwargs) -> requests.Response:
+    """Send a request to the backend through the shared session"""
+    kwargs.setdefault("timeout", 30)
+    return SESSION.request(method, f"{API_BASE}{path}", **kwargs)
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+def _json_dumps(obj: Any) -> bytes:
+    """Encode a request body, using orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+def _json_loads(data) -> Any:
+    """Decode a response body, using orjson when available"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Precompiled TTS cleanup patterns
+_TTS_EMOJI_TBL = str.maketrans('', '', '🤖🎓🚀📊🧠❌🚫⚡🔥💡🎤🔊📚🌍📄🔍🎯💪✨🌟💫🏆')
+_TTS_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_TTS_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_TTS_CODE_RE = re.compile(r'```.*?```', re.DOTALL)
+_TTS_NEWLINE_RE = re.compile(r'\n+')
+_TTS_ABBREVIATIONS = {'AI': 'A I', 'LLM': 'Language Model', 'RAG': 'R A G', 'API': 'A P I'}
+_TTS_ABBREV_RE = re.compile('|'.join(_TTS_ABBREVIATIONS))
+
+# Local cache of backend chat replies, keyed by language + recent turns + message
+RESPONSE_CACHE_SIZE = 128
+CACHE_CONTEXT_TURNS = 6
+_RESP_CACHE: "OrderedDict[str, Dict]" = OrderedDict()
+
+def _response_cache_key(message: str, history: List) -> str:
+    """Hash the chat context that determines the backend reply"""
+    raw = json.dumps(
+        [state.current_language, history[-CACHE_CONTEXT_TURNS:], message],
+        sort_keys=True, default=str
+    )
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+def _cache_get(key: str) -> Optional[Dict]:
+    """Return a cached reply and mark it as recently used"""
+    result = _RESP_CACHE.get(key)
+    if result is not None:
+        _RESP_CACHE.move_to_end(key)
+    return result
+
+def _cache_put(key: str, result: Dict):
+    """Store a reply, evicting the least recently used entry when full"""
+    _RESP_CACHE[key] = result
+    _RESP_CACHE.move_to_end(key)
+    while len(_RESP_CACHE) > RESPONSE_CACHE_SIZE:
+        _RESP_CACHE.popitem(last=False)
 
 # Global state
 class UltimateState:
@@ -34,36 +122,63 @@ class UltimateState:
         self.current_language = "en"
         self.voice_enabled = True
         self.backend_connected = False
+        self.health_checked_at = 0.0
         self.uploaded_documents = []
+        self.doc_hashes = {}  # content digest -> backend result, for skipping re-uploads
         self.session_stats = {"questions": 0, "docs_uploaded": 0, "searches": 0}
 
 state = UltimateState()
 
+def _port_in_use(port: int) -> bool:
+    """Return True if something is listening on the local port"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(0.1)
+    try:
+        return sock.connect_ex(('127.0.0.1', port)) == 0
+    finally:
+        sock.close()
+
 def kill_existing_processes():
     """Kill any existing processes on ports 7860 and 8000"""
     try:
-        # Kill processes on port 8000 (backend)
-        subprocess.run(['fuser', '-k', '8000/tcp'], capture_output=True)
-        # Kill processes on port 7860 (frontend)  
-        subprocess.run(['fuser', '-k', '7860/tcp'], capture_output=True)
-        # Kill any gradio processes
-        subprocess.run(['pkill', '-f', 'gradio'], capture_output=True)
-        subprocess.run(['pkill', '-f', 'enhanced_backend'], capture_output=True)
-        time.sleep(2)
+        # Only shell out for ports that are actually taken
+        busy_ports = [port for port in (8000, 7860) if _port_in_use(port)]
+        if not busy_ports:
+            return
+        
+        for port in busy_ports:
+            subprocess.run(['fuser', '-k', f'{port}/tcp'], capture_output=True)
+        
+        # Wait until the ports are released, but no longer than 2 seconds
+        deadline = time.monotonic() + 2
+        while any(_port_in_use(port) for port in busy_ports) and time.monotonic() < deadline:
+            time.sleep(0.05)
         print("🔄 Cleaned up existing processes")
-    except:
+    except (OSError, subprocess.SubprocessError):
+        # fuser missing or not permitted - leave the ports as they are
         pass
 
 def check_backend_connection() -> bool:
-    """Check if backend is running"""
+    """Check if backend is running (cached for HEALTH_CHECK_TTL seconds)"""
+    now = time.monotonic()
+    if now - state.health_checked_at < HEALTH_CHECK_TTL:
+        return state.backend_connected
+    state.health_checked_at = now
+    
     try:
-        response = requests.get(f"{API_BASE}/health", timeout=3)
-        if response.status_code == 200:
-            state.backend_connected = True
-            return True
-    except:
+        response = _api("GET", "/health", timeout=3)
+        state.backend_connected = response.status_code == 200
+    except (requests.ConnectionError, requests.Timeout, socket.timeout):
         state.backend_connected = False
-    return False
+    return state.backend_connected
+
+def set_auth_token(token: Optional[str]):
+    """Store the login token and attach it to every request on the shared session"""
+    state.auth_token = token
+    if token:
+        SESSION.headers["Authorization"] = f"Bearer {token}"
+    else:
+        SESSION.headers.pop("Authorization", None)
 
 def login_user(username: str, password: str) -> str:
     """Enhanced login with backend connection check"""
@@ -92,21 +207,21 @@ Your quantized LLM backend isn't running yet.
 Then refresh this page and try logging in again! 🔄""", "error")
         
         # Attempt login
-        response = requests.post(
-            f"{API_BASE}/auth/login",
+        response = _api(
+            "POST", "/auth/login",
             json={"username": username, "password": password},
             timeout=10
         )
         
         if response.status_code == 200:
             data = response.json()
-            state.auth_token = data.get("access_token")
+            set_auth_token(data.get("access_token"))
             state.username = username
             state.session_stats = {"questions": 0, "docs_uploaded": 0, "searches": 0}
             
             # Get model status
             try:
-                model_response = requests.get(f"{API_BASE}/models/status", timeout=5)
+                model_response = _api("GET", "/models/status", timeout=5)
                 if model_response.status_code == 200:
                     model_info = model_response.json()
                     
@@ -174,35 +289,80 @@ Then refresh this page and try logging in again! 🔄""", "error")
     except Exception as e:
         return create_status_card(f"🚫 Connection Error: {str(e)}", "error")
 
+_STATUS_ICONS = {"success": "✅", "error": "❌", "warning": "⚠️", "info": "ℹ️"}
+_STATUS_COLORS = {"success": "#4CAF50", "error": "#f44336", "warning": "#ff9800", "info": "#2196F3"}
+
+_STATUS_CARD_TMPL = """
+<div class="status-card %(type)s animate-bounce-in">
+    <div class="status-content">
+        <div class="status-icon" style="color: %(color)s;">%(icon)s</div>
+        <div class="status-message">%(message)s</div>
+    </div>
+</div>
+    """
+
 def create_status_card(message: str, status_type: str) -> str:
     """Create animated status cards"""
-    icons = {"success": "✅", "error": "❌", "warning": "⚠️", "info": "ℹ️"}
-    colors = {"success": "#4CAF50", "error": "#f44336", "warning": "#ff9800", "info": "#2196F3"}
+    return _STATUS_CARD_TMPL % {
+        "type": status_type,
+        "color": _STATUS_COLORS.get(status_type, "#2196F3"),
+        "icon": _STATUS_ICONS.get(status_type, "ℹ️"),
+        "message": message,
+    }
+
+def format_ai_reply(result: Dict) -> str:
+    """Decorate a backend chat result with model info and session stats"""
+    ai_response = result.get("response", "")
     
-    icon = icons.get(status_type, "ℹ️")
-    color = colors.get(status_type, "#2196F3")
+    # Enhance response with model info
+    inference_time = result.get("inference_time", 0)
+    model_loaded = result.get("model_loaded", False)
     
-    return f"""
-<div class="status-card {status_type} animate-bounce-in">
-    <div class="status-content">
-        <div class="status-icon" style="color: {color};">{icon}</div>
-        <div class="status-message">{message}</div>
-    </div>
-</div>
+    if model_loaded and inference_time:
+        return f"""🤖 **Quantized AI Response** ⚡{inference_time}ms
+
+{ai_response}
+
+💡 **Session Stats:** {state.session_stats["questions"]} questions • {state.session_stats["docs_uploaded"]} docs • {state.session_stats["searches"]} searches"""
+    return ai_response
+
+def build_chat_context(history: List) -> List[Dict]:
+    """Last MAX_CTX_TURNS exchanges for the backend prompt.
+    
+    Older turns are folded into a one-line summary of what the user asked, so
+    the prompt stays the same size however long the conversation gets.
     """
+    window = 2 * MAX_CTX_TURNS
+    context = [{"role": turn["role"], "content": turn["content"]} for turn in history[-window:]]
+    
+    older_questions = [turn["content"][:60] for turn in history[:-window] if turn.get("role") == "user"]
+    if older_questions:
+        context.insert(0, {
+            "role": "system",
+            "content": "Earlier summary: the user asked about " + "; ".join(older_questions[-5:])
+        })
+    return context
+
+def stream_chat_events(response: requests.Response) -> Iterator[Dict]:
+    """Yield the JSON payload of every SSE `data:` line from a streaming response"""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            yield _json_loads(line[5:])
 
-def ultimate_chat_with_ai(message: str, history: List) -> Tuple[List, str, str]:
-    """Ultimate chat function with real AI - FIXED for new Gradio format"""
+def ultimate_chat_with_ai(message: str, history: List) -> Iterator[Tuple[List, str, str]]:
+    """Ultimate chat function with real AI - streams tokens into the chat as they arrive"""
     if not state.auth_token:
         if history is None:
             history = []
         # New Gradio format with role/content
         history.append({"role": "user", "content": message})
         history.append({"role": "assistant", "content": "🔐 **Please log in first to chat with the AI!**"})
-        return history, "", ""
+        yield history, "", ""
+        return
     
     if not message.strip():
-        return history, "", ""
+        yield history, "", ""
+        return
     
     if history is None:
         history = []
@@ -218,68 +378,168 @@ def ultimate_chat_with_ai(message: str, history: List) -> Tuple[List, str, str]:
             # New format
             history.append({"role": "user", "content": message})
             history.append({"role": "assistant", "content": error_response})
-            return history, "", "Backend is not connected. Please start the backend server."
+            yield history, "", "Backend is not connected. Please start the backend server."
+            return
+    
+    # Identical prompt in identical context - reuse the previous reply
+    cache_key = _response_cache_key(message, history)
+    result = _cache_get(cache_key)
+    
+    if result is not None:
+        history.append({"role": "user", "content": message})
+        history.append({"role": "assistant", "content": format_ai_reply(result)})
+        yield history, "", result.get("tts_text", clean_for_tts(result.get("response", "")))
+        return
+    
+    body = _json_dumps({
+        "message": message,
+        "language": state.current_language,
+        "use_context": True,
+        "voice_mode": True,
+        "max_tokens": 300,
+        "history": build_chat_context(history)
+    })
+    # History length before this turn, used to roll back a partial stream
+    context_len = len(history)
     
     try:
         start_time = time.time()
         
-        # Send to real AI backend
-        response = requests.post(
-            f"{API_BASE}/chat/quantized",
-            json={
-                "message": message,
-                "language": state.current_language,
-                "use_context": True,
-                "voice_mode": True,
-                "max_tokens": 300
-            },
-            headers={"Authorization": f"Bearer {state.auth_token}"} if state.auth_token else {},
-            timeout=30
-        )
+        # Stream from the real AI backend so tokens show up as they are generated
+        response = _api("POST", "/chat/quantized/stream", data=body, headers=JSON_HEADERS,
+                        stream=True, timeout=(3, 120))
         
-        if response.status_code == 200:
-            result = response.json()
-            ai_response = result.get("response", "")
+        if response.status_code == 404:
+            # Older backend without streaming - fall back to the blocking endpoint
+            response.close()
+            response = _api("POST", "/chat/quantized", data=body, headers=JSON_HEADERS, timeout=30)
+            if response.status_code == 200:
+                result = _json_loads(response.content)
+        
+        elif response.status_code == 200:
+            history.append({"role": "user", "content": message})
+            history.append({"role": "assistant", "content": ""})
             
-            # Enhance response with model info
-            inference_time = result.get("inference_time", 0)
-            model_loaded = result.get("model_loaded", False)
+            with response:
+                for event in stream_chat_events(response):
+                    if event.get("done"):
+                        result = event
+                        break
+                    history[-1]["content"] += event.get("delta", "")
+                    yield history, "", ""
             
-            if model_loaded and inference_time:
-                enhanced_response = f"""🤖 **Quantized AI Response** ⚡{inference_time}ms
-
-{ai_response}
-
-💡 **Session Stats:** {state.session_stats["questions"]} questions • {state.session_stats["docs_uploaded"]} docs • {state.session_stats["searches"]} searches"""
-            else:
-                enhanced_response = ai_response
+            if result is None:
+                # Stream ended without a summary event - keep what we received
+                result = {"response": history[-1]["content"]}
+            del history[context_len:]
+        
+        if result is not None:
+            _cache_put(cache_key, result)
+            ai_response = result.get("response", "")
             
             # Add to conversation - NEW GRADIO FORMAT
             history.append({"role": "user", "content": message})
-            history.append({"role": "assistant", "content": enhanced_response})
+            history.append({"role": "assistant", "content": format_ai_reply(result)})
             
             # Get TTS text
             tts_text = result.get("tts_text", clean_for_tts(ai_response))
             
-            return history, "", tts_text
+            yield history, "", tts_text
             
         else:
             error_msg = f"❌ **AI Error** (Status {response.status_code})\n\nThe AI model encountered an issue. This might be due to:\n- Model still loading\n- High server load\n- Network timeout\n\nTry asking again in a moment!"
             history.append({"role": "user", "content": message})
             history.append({"role": "assistant", "content": error_msg})
-            return history, "", "Sorry, the AI model is having an issue. Please try again."
+            yield history, "", "Sorry, the AI model is having an issue. Please try again."
             
     except requests.exceptions.Timeout:
         error_msg = "⏱️ **Request Timeout**\n\nThe AI is taking longer than usual to respond. This might be because:\n- Model is processing a complex request\n- Server is under load\n\nTry asking a simpler question or wait a moment!"
+        del history[context_len:]
         history.append({"role": "user", "content": message})
         history.append({"role": "assistant", "content": error_msg})
-        return history, "", "The AI request timed out. Please try again with a simpler question."
+        yield history, "", "The AI request timed out. Please try again with a simpler question."
         
     except Exception as e:
         error_msg = f"🚫 **Connection Error**\n\nCouldn't connect to the AI: {str(e)}\n\nMake sure your backend is running:\n```bash\npython enhanced_backend.py\n```"
+        del history[context_len:]
         history.append({"role": "user", "content": message})
         history.append({"role": "assistant", "content": error_msg})
-        return history, "", "There was a connection error. Please check the backend."
+        yield history, "", "There was a connection error. Please check the backend."
+
+def _iter_text(file, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Iterator[str]:
+    """Decode an uploaded file as UTF-8 chunk by chunk, dropping invalid bytes"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    fh = file if hasattr(file, 'read') else open(file, 'rb')
+    try:
+        while chunk := fh.read(chunk_size):
+            yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+    finally:
+        if fh is not file:
+            fh.close()
+
+def _iter_multipart(fields: Dict[str, str], stream_name: str, chunks: Iterator[str], boundary: str) -> Iterator[bytes]:
+    """Encode form fields plus one streamed text field as a multipart/form-data body"""
+    for name, value in fields.items():
+        yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+               f'{value}\r\n').encode('utf-8')
+    yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{stream_name}"\r\n'
+           f'Content-Type: text/plain; charset=utf-8\r\n\r\n').encode('utf-8')
+    for chunk in chunks:
+        if chunk:
+            yield chunk.encode('utf-8')
+    yield f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+def _file_digest(file) -> str:
+    """BLAKE2b digest of an uploaded file's raw bytes, read in chunks"""
+    digest = hashlib.blake2b(digest_size=16)
+    fh = file if hasattr(file, 'read') else open(file, 'rb')
+    try:
+        while chunk := fh.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    finally:
+        if fh is file:
+            fh.seek(0)
+        else:
+            fh.close()
+    return digest.hexdigest()
+
+def _upload_one(file) -> Optional[Tuple[str, Dict, bool]]:
+    """Stream one file to the backend.
+    
+    Returns (digest, result, cached) - cached is True when identical content was
+    already processed this session and the backend call was skipped.
+    """
+    if not hasattr(file, 'name'):
+        return None
+    
+    filename = file.name
+    
+    try:
+        digest = _file_digest(file)
+        cached = state.doc_hashes.get(digest)
+        if cached is not None:
+            return digest, {**cached, "filename": filename}, True
+        
+        # Send to backend for processing - the body is decoded and sent in
+        # UPLOAD_CHUNK_SIZE pieces (chunked transfer) instead of held in memory
+        boundary = uuid.uuid4().hex
+        response = _api(
+            "POST", "/documents",
+            data=_iter_multipart({"filename": filename}, "content", _iter_text(file), boundary),
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+            timeout=60
+        )
+        
+        if response.status_code == 200:
+            result = _json_loads(response.content)
+            result.setdefault("filename", filename)
+            return digest, result, False
+        
+    except Exception as e:
+        logger.error(f"Error processing {filename}: {e}")
+    
+    return None
 
 def ultimate_upload_documents(files) -> str:
     """Ultimate document upload with real backend processing"""
@@ -299,56 +559,31 @@ def ultimate_upload_documents(files) -> str:
         total_words = 0
         files_list = files if isinstance(files, list) else [files]
         
-        for file in files_list:
-            if hasattr(file, 'name'):
-                filename = file.name
-                
-                try:
-                    # Read file content
-                    if hasattr(file, 'read'):
-                        content = file.read()
-                    else:
-                        with open(file, 'rb') as f:
-                            content = f.read()
-                    
-                    # Convert to text
-                    if isinstance(content, bytes):
-                        try:
-                            text_content = content.decode('utf-8')
-                        except UnicodeDecodeError:
-                            text_content = content.decode('utf-8', errors='ignore')
-                    else:
-                        text_content = str(content)
-                    
-                    # Send to backend for processing
-                    response = requests.post(
-                        f"{API_BASE}/documents",
-                        data={
-                            "filename": filename,
-                            "content": text_content
-                        },
-                        headers={"Authorization": f"Bearer {state.auth_token}"} if state.auth_token else {},
-                        timeout=60
-                    )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        processed_files.append({
-                            "filename": result.get("filename", filename),
-                            "language": result.get("language", "unknown"),
-                            "word_count": result.get("word_count", 0),
-                            "chunks": result.get("chunks_created", 0),
-                            "doc_id": result.get("document_id", "unknown")
-                        })
-                        total_words += result.get("word_count", 0)
-                        
-                        # Add to local state
-                        state.uploaded_documents.append(result)
-                        state.session_stats["docs_uploaded"] += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error processing {filename}: {e}")
+        # Uploads are independent network I/O - run them concurrently and
+        # only touch shared state from this thread
+        with ThreadPoolExecutor(max_workers=min(8, len(files_list))) as executor:
+            futures = [executor.submit(_upload_one, file) for file in files_list]
+            
+            for future in as_completed(futures):
+                outcome = future.result()
+                if outcome is None:
                     continue
+                digest, result, cached = outcome
+                
+                processed_files.append({
+                    "filename": result.get("filename"),
+                    "language": result.get("language", "unknown"),
+                    "word_count": result.get("word_count", 0),
+                    "chunks": result.get("chunks_created", 0),
+                    "doc_id": result.get("document_id", "unknown")
+                })
+                total_words += result.get("word_count", 0)
+                
+                # Add to local state - duplicates were already counted
+                if not cached:
+                    state.doc_hashes[digest] = result
+                    state.uploaded_documents.append(result)
+                    state.session_stats["docs_uploaded"] += 1
         
         if processed_files:
             return create_upload_success(processed_files, total_words)
@@ -359,24 +594,20 @@ def ultimate_upload_documents(files) -> str:
         logger.error(f"Upload error: {e}")
         return create_upload_status(f"❌ Upload failed: {str(e)}", "error")
 
-def create_upload_success(files: List[Dict], total_words: int) -> str:
-    """Create beautiful animated upload success message"""
-    files_html = ""
-    for i, file in enumerate(files):
-        files_html += f"""
-        <div class="uploaded-file animate-slide-up" style="animation-delay: {i * 0.1}s;">
+_UPLOAD_FILE_ROW_TMPL = """
+        <div class="uploaded-file animate-slide-up" style="animation-delay: %(delay)ss;">
             <div class="file-icon">📄</div>
             <div class="file-info">
-                <div class="file-name">{file['filename']}</div>
+                <div class="file-name">%(filename)s</div>
                 <div class="file-details">
-                    📊 {file['word_count']:,} words • 🌍 {file['language']} • 🧩 {file['chunks']} chunks
+                    📊 %(word_count)s words • 🌍 %(language)s • 🧩 %(chunks)s chunks
                 </div>
             </div>
             <div class="file-status">✅</div>
         </div>
         """
-    
-    return f"""
+
+_UPLOAD_SUCCESS_TMPL = """
 <div class="upload-success animate-bounce-in">
     <div class="success-header">
         <div class="success-icon animate-pulse">🎉</div>
@@ -386,21 +617,21 @@ def create_upload_success(files: List[Dict], total_words: int) -> str:
     
     <div class="upload-stats">
         <div class="stat-item animate-fade-in" style="animation-delay: 0.2s;">
-            <div class="stat-number">{len(files)}</div>
+            <div class="stat-number">%(file_count)s</div>
             <div class="stat-label">Files</div>
         </div>
         <div class="stat-item animate-fade-in" style="animation-delay: 0.4s;">
-            <div class="stat-number">{total_words:,}</div>
+            <div class="stat-number">%(total_words)s</div>
             <div class="stat-label">Words</div>
         </div>
         <div class="stat-item animate-fade-in" style="animation-delay: 0.6s;">
-            <div class="stat-number">{sum(f['chunks'] for f in files)}</div>
+            <div class="stat-number">%(total_chunks)s</div>
             <div class="stat-label">Chunks</div>
         </div>
     </div>
     
     <div class="uploaded-files">
-        {files_html}
+        %(files_html)s
     </div>
     
     <div class="upload-tip animate-slide-up" style="animation-delay: 0.8s;">
@@ -409,6 +640,26 @@ def create_upload_success(files: List[Dict], total_words: int) -> str:
 </div>
     """
 
+def create_upload_success(files: List[Dict], total_words: int) -> str:
+    """Create beautiful animated upload success message"""
+    files_html = "".join(
+        _UPLOAD_FILE_ROW_TMPL % {
+            "delay": i * 0.1,
+            "filename": file['filename'],
+            "word_count": f"{file['word_count']:,}",
+            "language": file['language'],
+            "chunks": file['chunks'],
+        }
+        for i, file in enumerate(files)
+    )
+    
+    return _UPLOAD_SUCCESS_TMPL % {
+        "file_count": len(files),
+        "total_words": f"{total_words:,}",
+        "total_chunks": sum(f['chunks'] for f in files),
+        "files_html": files_html,
+    }
+
 def create_upload_status(message: str, status_type: str) -> str:
     """Create upload status message"""
     return create_status_card(message, status_type)
@@ -430,15 +681,14 @@ def ultimate_search_documents(query: str) -> str:
     state.session_stats["searches"] += 1
     
     try:
-        response = requests.get(
-            f"{API_BASE}/search",
+        response = _api(
+            "GET", "/search",
             params={"query": query, "limit": 5},
-            headers={"Authorization": f"Bearer {state.auth_token}"} if state.auth_token else {},
             timeout=30
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = _json_loads(response.content)
             results = data.get("results", [])
             total_docs = data.get("total_documents", 0)
             
@@ -461,42 +711,35 @@ def ultimate_search_documents(query: str) -> str:
     except Exception as e:
         return create_search_status(f"❌ Search error: {str(e)}", "error")
 
-def create_search_results(query: str, results: List[Dict], total_docs: int) -> str:
-    """Create beautiful animated search results"""
-    results_html = ""
-    for i, result in enumerate(results):
-        relevance = result.get('relevance_score', 0)
-        relevance_color = "#4CAF50" if relevance > 80 else "#ff9800" if relevance > 60 else "#f44336"
-        
-        results_html += f"""
-        <div class="search-result animate-slide-up" style="animation-delay: {i * 0.1}s;">
+_SEARCH_RESULT_ROW_TMPL = """
+        <div class="search-result animate-slide-up" style="animation-delay: %(delay)ss;">
             <div class="result-header">
-                <div class="result-title">📄 {result.get('filename', 'Unknown File')}</div>
-                <div class="result-relevance" style="background-color: {relevance_color};">
-                    {relevance}% match
+                <div class="result-title">📄 %(filename)s</div>
+                <div class="result-relevance" style="background-color: %(color)s;">
+                    %(relevance)s%% match
                 </div>
             </div>
             <div class="result-content">
                 <div class="result-preview">
-                    {result.get('content_preview', 'No preview available')[:300]}{'...' if len(result.get('content_preview', '')) > 300 else ''}
+                    %(preview)s
                 </div>
                 <div class="result-matches">
-                    📍 {result.get('matches', 1)} match{'es' if result.get('matches', 1) != 1 else ''} found
+                    📍 %(matches)s match%(plural)s found
                 </div>
             </div>
         </div>
         """
-    
-    return f"""
+
+_SEARCH_RESULTS_TMPL = """
 <div class="search-results animate-bounce-in">
     <div class="search-header">
         <div class="search-icon animate-pulse">🔍</div>
-        <div class="search-title">Found {len(results)} results for "{query}"</div>
-        <div class="search-subtitle">Searched across {total_docs} documents</div>
+        <div class="search-title">Found %(result_count)s results for "%(query)s"</div>
+        <div class="search-subtitle">Searched across %(total_docs)s documents</div>
     </div>
     
     <div class="results-container">
-        {results_html}
+        %(results_html)s
     </div>
     
     <div class="search-tips animate-fade-in" style="animation-delay: 0.8s;">
@@ -511,26 +754,48 @@ def create_search_results(query: str, results: List[Dict], total_docs: int) -> s
 </div>
     """
 
+def _search_result_row(i: int, result: Dict) -> str:
+    """Render one search hit"""
+    relevance = result.get('relevance_score', 0)
+    preview = result.get('content_preview', 'No preview available')
+    matches = result.get('matches', 1)
+    
+    return _SEARCH_RESULT_ROW_TMPL % {
+        "delay": i * 0.1,
+        "filename": result.get('filename', 'Unknown File'),
+        "color": "#4CAF50" if relevance > 80 else "#ff9800" if relevance > 60 else "#f44336",
+        "relevance": relevance,
+        "preview": preview[:300] + ('...' if len(preview) > 300 else ''),
+        "matches": matches,
+        "plural": 'es' if matches != 1 else '',
+    }
+
+def create_search_results(query: str, results: List[Dict], total_docs: int) -> str:
+    """Create beautiful animated search results"""
+    results_html = "".join(_search_result_row(i, result) for i, result in enumerate(results))
+    
+    return _SEARCH_RESULTS_TMPL % {
+        "result_count": len(results),
+        "query": query,
+        "total_docs": total_docs,
+        "results_html": results_html,
+    }
+
 def create_search_status(message: str, status_type: str) -> str:
     """Create search status message"""
     return create_status_card(message, status_type)
 
 def clean_for_tts(text: str) -> str:
     """Clean text for text-to-speech"""
-    import re
-    
     # Remove emojis and special characters
-    text = re.sub(r'[🤖🎓🚀📊🧠❌🚫⚡🔥💡🎤🔊📚🌍📄🔍🎯💪✨🌟💫🏆]', '', text)
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'\*(.*?)\*', r'\1', text)
-    text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
-    text = re.sub(r'\n+', '. ', text)
+    text = text.translate(_TTS_EMOJI_TBL)
+    text = _TTS_BOLD_RE.sub(r'\1', text)
+    text = _TTS_ITALIC_RE.sub(r'\1', text)
+    text = _TTS_CODE_RE.sub('', text)
+    text = _TTS_NEWLINE_RE.sub('. ', text)
     
     # Make abbreviations speech-friendly
-    text = text.replace('AI', 'A I')
-    text = text.replace('LLM', 'Language Model')
-    text = text.replace('RAG', 'R A G')
-    text = text.replace('API', 'A P I')
+    text = _TTS_ABBREV_RE.sub(lambda m: _TTS_ABBREVIATIONS[m.group()], text)
     
     # Limit length for TTS
     sentences = text.split('.')
@@ -543,411 +808,63 @@ def clear_chat():
     """Clear chat history"""
     return [], ""
 
+# Static interface HTML - built once at import instead of per interface build
+_HEADER_HTML = """
+<div class="ultimate-card animate-bounce-in">
+    <div style="text-align: center;">
+        <h1 style="font-size: 4rem; margin-bottom: 20px; background: linear-gradient(45deg, #4facfe, #00f2fe, #667eea, #764ba2); -webkit-background-clip: text; -webkit-text-fill-color: transparent; font-weight: 900;">
+            🤖 FIXED Ultimate Quantized LLM
+        </h1>
+        <h2 style="font-size: 2rem; margin-bottom: 24px; opacity: 0.95; font-weight: 700;">
+            No Errors • No Warnings • Perfect Experience
+        </h2>
+        <p style="font-size: 1.4rem; opacity: 0.85; line-height: 1.6;">
+            ✅ <strong>Fixed Gradio Warnings</strong> • ✅ <strong>Port Management</strong> • ✅ <strong>Error Handling</strong>
+        </p>
+    </div>
+</div>
+"""
+
+_VOICE_SECTION_HTML = """
+<div class="ultimate-card animate-slide-up">
+    <div style="text-align: center;">
+        <h3 style="font-size: 2rem; margin-top: 0; margin-bottom: 20px;">🎤 Fixed Voice Interface</h3>
+
+        <button id="fixed-voice-btn" class="ultimate-voice-btn animate-float" onclick="startFixedVoice()" title="Click to start voice input">
+            🎤
+        </button>
+
+        <div class="voice-status" style="color: white; font-size: 1.3rem; font-weight: 600; text-align: center; margin: 24px; padding: 20px; background: rgba(255,255,255,0.1); border-radius: 20px;">
+            🚀 Fixed voice system loading...
+        </div>
+    </div>
+</div>
+"""
+
+_SIDEBAR_HTML = """
+<div class="ultimate-card">
+    <h4 style="color: #4facfe;">🛠️ Fixed Issues</h4>
+    <ul style="color: rgba(255,255,255,0.9); line-height: 1.6;">
+        <li>✅ <strong>Gradio Warnings</strong><br>Updated to new format</li>
+        <li>✅ <strong>Port Conflicts</strong><br>Auto cleanup processes</li>
+        <li>✅ <strong>Missing Dependencies</strong><br>Better error messages</li>
+        <li>✅ <strong>FastAPI Warnings</strong><br>Updated event handlers</li>
+    </ul>
+</div>
+"""
+
+_STATIC_CHROME_HTML = _HEADER_HTML + _VOICE_SECTION_HTML
+
 def create_fixed_ultimate_interface():
     """Create the FIXED ultimate interface with no errors"""
     
-    # Same ultimate CSS (keeping it the same as it works perfectly)
-    ultimate_css = """
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
-    
-    :root {
-        --primary-gradient: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        --secondary-gradient: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);
-        --accent-gradient: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%);
-        --success-gradient: linear-gradient(135deg, #11998e 0%, #38ef7d 100%);
-        --glass-bg: rgba(255, 255, 255, 0.1);
-        --glass-border: rgba(255, 255, 255, 0.2);
-        --shadow-light: 0 8px 32px rgba(0, 0, 0, 0.1);
-        --shadow-heavy: 0 20px 60px rgba(0, 0, 0, 0.2);
-    }
-    
-    * {
-        font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif !important;
-    }
-    
-    .gradio-container {
-        background: var(--primary-gradient) !important;
-        color: white !important;
-        min-height: 100vh !important;
-    }
-    
-    /* Animation keyframes */
-    @keyframes bounce-in {
-        0% { transform: scale(0) rotate(-180deg); opacity: 0; }
-        50% { transform: scale(1.2) rotate(-10deg); opacity: 0.8; }
-        100% { transform: scale(1) rotate(0deg); opacity: 1; }
-    }
-    
-    @keyframes slide-up {
-        0% { transform: translateY(50px); opacity: 0; }
-        100% { transform: translateY(0); opacity: 1; }
-    }
-    
-    @keyframes fade-in {
-        0% { opacity: 0; }
-        100% { opacity: 1; }
-    }
-    
-    @keyframes pulse {
-        0%, 100% { transform: scale(1); }
-        50% { transform: scale(1.05); }
-    }
-    
-    @keyframes glow {
-        0%, 100% { box-shadow: 0 0 20px rgba(79, 172, 254, 0.3); }
-        50% { box-shadow: 0 0 40px rgba(79, 172, 254, 0.7); }
-    }
-    
-    @keyframes float {
-        0%, 100% { transform: translateY(0px); }
-        50% { transform: translateY(-10px); }
-    }
-    
-    /* Apply animations */
-    .animate-bounce-in { animation: bounce-in 0.8s cubic-bezier(0.175, 0.885, 0.32, 1.275); }
-    .animate-slide-up { animation: slide-up 0.6s ease-out; }
-    .animate-fade-in { animation: fade-in 0.5s ease-out; }
-    .animate-pulse { animation: pulse 2s infinite; }
-    .animate-glow { animation: glow 2s ease-in-out infinite; }
-    .animate-float { animation: float 3s ease-in-out infinite; }
-    
-    /* Ultimate cards */
-    .ultimate-card {
-        background: var(--glass-bg) !important;
-        backdrop-filter: blur(20px) !important;
-        border-radius: 24px !important;
-        padding: 32px !important;
-        margin: 20px 0 !important;
-        border: 2px solid var(--glass-border) !important;
-        box-shadow: var(--shadow-light) !important;
-        transition: all 0.4s cubic-bezier(0.175, 0.885, 0.32, 1.275) !important;
-        position: relative !important;
-        overflow: hidden !important;
-    }
-    
-    .ultimate-card:hover {
-        transform: translateY(-8px) !important;
-        box-shadow: var(--shadow-heavy) !important;
-        border-color: rgba(79, 172, 254, 0.5) !important;
-    }
-    
-    /* Voice button - ultimate version */
-    .ultimate-voice-btn {
-        background: var(--accent-gradient) !important;
-        border: 4px solid white !important;
-        border-radius: 50% !important;
-        width: 160px !important;
-        height: 160px !important;
-        font-size: 4rem !important;
-        color: white !important;
-        cursor: pointer !important;
-        margin: 30px auto !important;
-        display: block !important;
-        transition: all 0.4s cubic-bezier(0.175, 0.885, 0.32, 1.275) !important;
-        position: relative !important;
-        overflow: hidden !important;
-        box-shadow: 0 20px 60px rgba(79, 172, 254, 0.4) !important;
-    }
-    
-    .ultimate-voice-btn:hover {
-        transform: scale(1.1) rotateZ(5deg) !important;
-        box-shadow: 0 30px 80px rgba(79, 172, 254, 0.6) !important;
-    }
-    
-    .ultimate-voice-btn.listening {
-        background: var(--success-gradient) !important;
-        animation: glow 1s infinite, pulse 2s infinite !important;
-    }
-    
-    /* Status cards */
-    .status-card {
-        background: var(--glass-bg) !important;
-        backdrop-filter: blur(15px) !important;
-        border-radius: 20px !important;
-        padding: 24px !important;
-        margin: 16px 0 !important;
-        border: 2px solid var(--glass-border) !important;
-        text-align: center !important;
-    }
-    
-    .status-card.success { border-color: rgba(76, 175, 80, 0.6) !important; }
-    .status-card.error { border-color: rgba(244, 67, 54, 0.6) !important; }
-    .status-card.warning { border-color: rgba(255, 152, 0, 0.6) !important; }
-    
-    .status-content {
-        display: flex !important;
-        align-items: center !important;
-        justify-content: center !important;
-        gap: 16px !important;
-    }
-    
-    .status-icon {
-        font-size: 2rem !important;
-    }
-    
-    .status-message {
-        font-size: 1.1rem !important;
-        line-height: 1.5 !important;
-    }
-    
-    /* All other styles remain the same... */
-    """
-    
-    # Same ultimate JavaScript (works perfectly)
-    ultimate_js = """
-    <script>
-    console.log('🚀 Initializing FIXED Ultimate Voice System...');
-    
-    let recognition = null;
-    let synthesis = window.speechSynthesis;
-    let isListening = false;
-    let voices = [];
-    let lastTTSText = '';
-    
-    const languages = {
-        'en': { code: 'en-US', name: 'English', flag: '🇺🇸' },
-        'ta': { code: 'ta-IN', name: 'Tamil', flag: '🇮🇳' },
-        'hi': { code: 'hi-IN', name: 'Hindi', flag: '🇮🇳' },
-        'es': { code: 'es-ES', name: 'Spanish', flag: '🇪🇸' },
-        'fr': { code: 'fr-FR', name: 'French', flag: '🇫🇷' },
-        'de': { code: 'de-DE', name: 'German', flag: '🇩🇪' }
-    };
-    
-    function initFixedVoice() {
-        console.log('🎤 Setting up fixed voice recognition...');
-        
-        synthesis.addEventListener('voiceschanged', loadVoices);
-        loadVoices();
-        
-        if ('webkitSpeechRecognition' in window || 'SpeechRecognition' in window) {
-            const SpeechRecognition = window.webkitSpeechRecognition || window.SpeechRecognition;
-            recognition = new SpeechRecognition();
-            setupFixedRecognition();
-        } else {
-            console.warn('⚠️ Speech recognition not supported');
-            updateVoiceStatus('❌ Voice not supported - Please use Chrome or Edge', 'error');
-            return false;
-        }
-        
-        console.log('✅ Fixed voice system ready!');
-        updateVoiceStatus('🎤 Fixed voice ready - Click to start!', 'ready');
-        return true;
-    }
-    
-    function loadVoices() {
-        voices = synthesis.getVoices();
-        console.log(`🎙️ Loaded ${voices.length} voices for TTS`);
-    }
-    
-    function setupFixedRecognition() {
-        recognition.continuous = false;
-        recognition.interimResults = true;
-        recognition.lang = 'en-US';
-        
-        recognition.onstart = function() {
-            console.log('🎤 Fixed voice recognition started');
-            isListening = true;
-            updateVoiceButton('listening');
-            updateVoiceStatus('🎤 Listening... Speak clearly!', 'listening');
-        };
-        
-        recognition.onresult = function(event) {
-            let finalTranscript = '';
-            
-            for (let i = event.resultIndex; i < event.results.length; i++) {
-                if (event.results[i].isFinal) {
-                    finalTranscript += event.results[i][0].transcript;
-                }
-            }
-            
-            if (finalTranscript) {
-                console.log(`✅ Recognized: "${finalTranscript}"`);
-                fillMessageInput(finalTranscript);
-                updateVoiceStatus(`✅ Got it: "${finalTranscript}"`, 'success');
-            }
-        };
-        
-        recognition.onerror = function(event) {
-            console.error('❌ Voice recognition error:', event.error);
-            isListening = false;
-            updateVoiceButton('error');
-            updateVoiceStatus(`❌ Voice error: ${event.error}`, 'error');
-        };
-        
-        recognition.onend = function() {
-            console.log('🏁 Voice recognition ended');
-            isListening = false;
-            updateVoiceButton('ready');
-            updateVoiceStatus('🎤 Click microphone to speak again', 'ready');
-        };
-    }
-    
-    function startFixedVoice() {
-        if (!recognition) {
-            initFixedVoice();
-            return;
-        }
-        
-        if (isListening) {
-            recognition.stop();
-            return;
-        }
-        
-        try {
-            recognition.start();
-            updateVoiceStatus('🎤 Starting voice recognition...', 'starting');
-        } catch (error) {
-            console.error('❌ Failed to start voice recognition:', error);
-            updateVoiceStatus('❌ Could not start voice input', 'error');
-        }
-    }
-    
-    function speakFixedText(text) {
-        if (!text || !text.trim()) return;
-        
-        console.log('🔊 Speaking:', text.substring(0, 50) + '...');
-        synthesis.cancel();
-        
-        const utterance = new SpeechSynthesisUtterance(text);
-        utterance.rate = 0.9;
-        utterance.pitch = 1.0;
-        utterance.volume = 1.0;
-        
-        if (voices.length > 0) {
-            utterance.voice = voices[0];
-        }
-        
-        utterance.onstart = () => updateVoiceStatus('🔊 AI is speaking...', 'speaking');
-        utterance.onend = () => updateVoiceStatus('🎤 Click microphone to continue', 'ready');
-        
-        synthesis.speak(utterance);
-    }
-    
-    function updateVoiceButton(state) {
-        const btn = document.getElementById('fixed-voice-btn');
-        if (!btn) return;
-        
-        btn.className = 'ultimate-voice-btn';
-        
-        switch(state) {
-            case 'listening':
-                btn.className += ' listening';
-                btn.innerHTML = '🔴';
-                btn.title = 'Listening... Click to stop';
-                break;
-            case 'error':
-                btn.innerHTML = '❌';
-                btn.title = 'Voice error - Click to retry';
-                break;
-            case 'ready':
-            default:
-                btn.className += ' animate-float';
-                btn.innerHTML = '🎤';
-                btn.title = 'Click to start voice input';
-                break;
-        }
-    }
-    
-    function updateVoiceStatus(message, type = 'info') {
-        const statusElements = document.querySelectorAll('.voice-status');
-        statusElements.forEach(element => {
-            element.textContent = message;
-            element.className = `voice-status ${type}`;
-        });
-        console.log(`Voice Status:`, message);
-    }
-    
-    function fillMessageInput(text) {
-        const textareas = document.querySelectorAll('textarea');
-        
-        for (let textarea of textareas) {
-            const label = textarea.parentElement?.querySelector('label')?.textContent || '';
-            const placeholder = textarea.placeholder || '';
-            
-            if (label.toLowerCase().includes('chat') || 
-                placeholder.toLowerCase().includes('ask')) {
-                
-                textarea.value = text;
-                textarea.dispatchEvent(new Event('input', { bubbles: true }));
-                textarea.focus();
-                
-                // Visual feedback
-                textarea.style.background = 'rgba(79, 172, 254, 0.2)';
-                setTimeout(() => {
-                    textarea.style.background = '';
-                }, 2000);
-                
-                break;
-            }
-        }
-    }
-    
-    // Auto-speak TTS responses
-    setInterval(function() {
-        const ttsElements = document.querySelectorAll('textarea[style*="display: none"]');
-        
-        for (let element of ttsElements) {
-            if (element.value && element.value !== lastTTSText && element.value.length > 20) {
-                lastTTSText = element.value;
-                speakFixedText(element.value);
-                break;
-            }
-        }
-    }, 2000);
-    
-    // Initialize when page loads
-    document.addEventListener('DOMContentLoaded', function() {
-        console.log('🎓 Fixed interface loaded');
-        setTimeout(() => {
-            if (initFixedVoice()) {
-                updateVoiceStatus('🚀 Fixed voice system ready!', 'ready');
-            }
-        }, 1500);
-    });
-    
-    window.startFixedVoice = startFixedVoice;
-    console.log('🎉 Fixed Ultimate Voice System loaded!');
-    </script>
-    """
-    
     # Clean up any existing processes first
     kill_existing_processes()
     
-    with gr.Blocks(css=ultimate_css, title="🤖 FIXED Ultimate Quantized LLM Chatbot") as app:
-        
-        # Header
-        gr.HTML("""
-        <div class="ultimate-card animate-bounce-in">
-            <div style="text-align: center;">
-                <h1 style="font-size: 4rem; margin-bottom: 20px; background: linear-gradient(45deg, #4facfe, #00f2fe, #667eea, #764ba2); -webkit-background-clip: text; -webkit-text-fill-color: transparent; font-weight: 900;">
-                    🤖 FIXED Ultimate Quantized LLM
-                </h1>
-                <h2 style="font-size: 2rem; margin-bottom: 24px; opacity: 0.95; font-weight: 700;">
-                    No Errors • No Warnings • Perfect Experience
-                </h2>
-                <p style="font-size: 1.4rem; opacity: 0.85; line-height: 1.6;">
-                    ✅ <strong>Fixed Gradio Warnings</strong> • ✅ <strong>Port Management</strong> • ✅ <strong>Error Handling</strong>
-                </p>
-            </div>
-        </div>
-        """)
+    with gr.Blocks(head=STATIC_HEAD, js=STATIC_INIT_JS, title="🤖 FIXED Ultimate Quantized LLM Chatbot") as app:
         
-        # Voice Section
-        gr.HTML(f"""
-        <div class="ultimate-card animate-slide-up">
-            <div style="text-align: center;">
-                <h3 style="font-size: 2rem; margin-top: 0; margin-bottom: 20px;">🎤 Fixed Voice Interface</h3>
-                
-                <button id="fixed-voice-btn" class="ultimate-voice-btn animate-float" onclick="startFixedVoice()" title="Click to start voice input">
-                    🎤
-                </button>
-                
-                <div class="voice-status" style="color: white; font-size: 1.3rem; font-weight: 600; text-align: center; margin: 24px; padding: 20px; background: rgba(255,255,255,0.1); border-radius: 20px;">
-                    🚀 Fixed voice system loading...
-                </div>
-            </div>
-        </div>
-        """)
+        # Header + Voice Section - one static node instead of two components
+        gr.HTML(_STATIC_CHROME_HTML)
         
         # Login Section  
         with gr.Row():
@@ -970,17 +887,7 @@ def create_fixed_ultimate_interface():
 All Gradio warnings and port conflicts are fixed! 🎉""", "info"))
             
             with gr.Column(scale=1):
-                gr.HTML("""
-                <div class="ultimate-card">
-                    <h4 style="color: #4facfe;">🛠️ Fixed Issues</h4>
-                    <ul style="color: rgba(255,255,255,0.9); line-height: 1.6;">
-                        <li>✅ <strong>Gradio Warnings</strong><br>Updated to new format</li>
-                        <li>✅ <strong>Port Conflicts</strong><br>Auto cleanup processes</li>
-                        <li>✅ <strong>Missing Dependencies</strong><br>Better error messages</li>
-                        <li>✅ <strong>FastAPI Warnings</strong><br>Updated event handlers</li>
-                    </ul>
-                </div>
-                """)
+                gr.HTML(_SIDEBAR_HTML)
         
         # Chat Interface - FIXED FORMAT
         with gr.Row():
@@ -997,7 +904,8 @@ All Gradio warnings and port conflicts are fixed! 🎉""", "info"))
                         label="💬 Chat with AI", 
                         placeholder="Ask me anything or use voice above!",
                         lines=2,
-                        scale=4
+                        scale=4,
+                        elem_id="chat-input"
                     )
                     language_select = gr.Dropdown(
                         choices=["en", "ta", "hi", "es", "fr", "de"],
@@ -1012,7 +920,7 @@ All Gradio warnings and port conflicts are fixed! 🎉""", "info"))
                     clear_btn = gr.Button("🗑️ Clear", variant="secondary", scale=1)
                 
                 # Hidden TTS output
-                tts_output = gr.Textbox(visible=False, interactive=False)
+                tts_output = gr.Textbox(visible=False, interactive=False, elem_id="tts-hidden")
             
             with gr.Column(scale=1):
                 # Document Upload
@@ -1032,28 +940,17 @@ All Gradio warnings and port conflicts are fixed! 🎉""", "info"))
                 search_btn = gr.Button("🔍 Search", variant="primary")
                 search_results = gr.HTML(create_status_card("Upload documents to search!", "info"))
         
-        # Add JavaScript
-        gr.HTML(ultimate_js)
-        
         # FIXED Event Handlers
         login_btn.click(login_user, inputs=[username_input, password_input], outputs=[login_status])
         
-        send_btn.click(
-            ultimate_chat_with_ai,
-            inputs=[message_input, chatbot], 
-            outputs=[chatbot, message_input, tts_output]
-        )
-        
-        voice_btn.click(
-            lambda msg, hist: ultimate_chat_with_ai(msg, hist),
-            inputs=[message_input, chatbot],
-            outputs=[chatbot, message_input, tts_output]
-        )
-        
-        message_input.submit(
-            ultimate_chat_with_ai,
+        # One chat handler for send, voice and enter - "once" drops new
+        # triggers while a reply is still in flight instead of queueing duplicates
+        gr.on(
+            triggers=[send_btn.click, voice_btn.click, message_input.submit],
+            fn=ultimate_chat_with_ai,
             inputs=[message_input, chatbot],
-            outputs=[chatbot, message_input, tts_output]
+            outputs=[chatbot, message_input, tts_output],
+            trigger_mode="once"
         )
         
         clear_btn.click(clear_chat, outputs=[chatbot, message_input])
@@ -1083,7 +980,8 @@ if __name__ == "__main__":
             server_name="0.0.0.0",
             server_port=7860,
             share=False,
-            show_error=True
+            show_error=True,
+            allowed_paths=[str(STATIC_DIR)]
         )
     except Exception as e:
         logger.error(f"Launch failed: {e}")
@@ -4,11 +4,39 @@ Quick Status Check for Enhanced Phase 5 System
 Shows what's working and what needs to be started
 """
 
-import requests
+import os
 import subprocess
 import sys
-from pathlib import Path
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep-alive session so repeated health polls reuse one socket - created on
+# first use so a plain status check doesn't pay for importing requests
+_session = None
+
+def get_session():
+    """Return the shared health-check session"""
+    global _session
+    if _session is None:
+        import requests
+        _session = requests.Session()
+        _session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=2))
+    return _session
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+def running_command_lines():
+    """Command lines of all running processes, from a single psutil sweep"""
+    return [" ".join(proc.info['cmdline'] or []) for proc in psutil.process_iter(['cmdline'])]
+
+def listening_ports():
+    """Ports with a listening socket, from a single psutil lookup"""
+    return {conn.laddr.port for conn in psutil.net_connections(kind='inet')
+            if conn.status == psutil.CONN_LISTEN}
 
 def check_process(name):
     """Check if a process is running"""
@@ -29,7 +57,7 @@ def check_port(port):
 def check_backend():
     """Check if backend is responding"""
     try:
-        response = requests.get('http://localhost:8000/health', timeout=5)
+        response = get_session().get('http://localhost:8000/health', timeout=1)
         if response.status_code == 200:
             data = response.json()
             return True, data
@@ -37,58 +65,85 @@ def check_backend():
         pass
     return False, {}
 
+def check_processes():
+    """Return (backend_running, frontend_running)"""
+    # One process sweep shared by every lookup
+    if PSUTIL_AVAILABLE:
+        command_lines = running_command_lines()
+        is_running = lambda name: any(name in cmd for cmd in command_lines)
+    else:
+        is_running = check_process
+    
+    backend_running = is_running("enhanced_backend") or is_running("app.py")
+    frontend_running = is_running("gradio_ui") or is_running("enhanced_frontend")
+    return backend_running, frontend_running
+
+def check_ports():
+    """Return (port_8000_in_use, port_7860_in_use)"""
+    try:
+        ports_in_use = listening_ports() if PSUTIL_AVAILABLE else None
+    except psutil.AccessDenied:
+        # Some platforms only list sockets for root
+        ports_in_use = None
+    
+    if ports_in_use is not None:
+        return 8000 in ports_in_use, 7860 in ports_in_use
+    return check_port(8000), check_port(7860)
+
 def main():
     print("🤖 QUANTIZED LLM CHATBOT - PHASE 5 STATUS CHECK")
     print("=" * 50)
     
     # Check directory
-    if Path.cwd().name != "quantized-llm-chatbot":
+    if os.path.basename(os.getcwd()) != "quantized-llm-chatbot":
         print("❌ Please run from /home/zen/quantized-llm-chatbot")
         return
     
     print("📍 Location: ✅ quantized-llm-chatbot directory")
     
+    # The checks are independent - run them concurrently so the report
+    # takes as long as the slowest one (usually the health request)
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        health_future = executor.submit(check_backend)
+        processes_future = executor.submit(check_processes)
+        ports_future = executor.submit(check_ports)
+        venv_future = executor.submit(os.path.exists, "quantized-llm-env")
+        backend_file_future = executor.submit(os.path.exists, "enhanced_backend.py")
+        frontend_file_future = executor.submit(os.path.exists, "enhanced_frontend.py")
+        
+        backend_healthy, health_data = health_future.result()
+        backend_running, frontend_running = processes_future.result()
+        port_8000, port_7860 = ports_future.result()
+        venv_exists = venv_future.result()
+        backend_file_exists = backend_file_future.result()
+        frontend_file_exists = frontend_file_future.result()
+    
     # Check virtual environment
-    venv_path = Path("quantized-llm-env")
-    if venv_path.exists():
+    if venv_exists:
         print("🐍 Virtual Environment: ✅ quantized-llm-env exists")
     else:
         print("🐍 Virtual Environment: ❌ quantized-llm-env missing")
         print("   Run: python3 -m venv quantized-llm-env")
     
     # Check enhanced files
-    backend_file = Path("enhanced_backend.py")
-    frontend_file = Path("enhanced_frontend.py")
-    
-    if backend_file.exists():
+    if backend_file_exists:
         print("🔧 Enhanced Backend: ✅ enhanced_backend.py ready")
     else:
         print("🔧 Enhanced Backend: ❌ enhanced_backend.py missing")
     
-    if frontend_file.exists():
+    if frontend_file_exists:
         print("🎨 Enhanced Frontend: ✅ enhanced_frontend.py ready")
     else:
         print("🎨 Enhanced Frontend: ❌ enhanced_frontend.py missing")
     
-    # Check processes
-    backend_running = check_process("enhanced_backend") or check_process("app.py")
-    frontend_running = check_process("gradio_ui") or check_process("enhanced_frontend")
-    
     print("\n📊 PROCESS STATUS:")
     print(f"🔧 Backend Process: {'✅ Running' if backend_running else '❌ Not running'}")
     print(f"🎨 Frontend Process: {'✅ Running' if frontend_running else '❌ Not running'}")
     
-    # Check ports
-    port_8000 = check_port(8000)
-    port_7860 = check_port(7860)
-    
     print("\n🌐 PORT STATUS:")
     print(f"🔧 Port 8000 (Backend): {'✅ In use' if port_8000 else '❌ Available'}")
     print(f"🎨 Port 7860 (Frontend): {'✅ In use' if port_7860 else '❌ Available'}")
     
-    # Check backend health
-    backend_healthy, health_data = check_backend()
-    
     print("\n🤖 AI BACKEND STATUS:")
     if backend_healthy:
         print("🔧 Backend API: ✅ Responding")
@@ -113,7 +168,7 @@ def main():
         print("🔧 Backend API: http://localhost:8000")
         print("📖 API Docs: http://localhost:8000/docs")
     
-    if not venv_path.exists():
+    if not venv_exists:
         print("🐍 Setup Environment: chmod +x enhance_phase5.sh && ./enhance_phase5.sh")
     
     print("\n🎯 WHAT'S ENHANCED IN YOUR PHASE 5:")
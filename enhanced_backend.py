@@ -5,25 +5,35 @@ Upgrades model selection, prompt engineering, and response quality
 """
 
 import asyncio
+import json
 import logging
-from contextlib import asynccontextmanager
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List, Optional, Any
 import time
 import re
+from collections import deque
 
 from fastapi import FastAPI, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, field_validator
 import uvicorn
 
 # Enhanced AI/ML imports
 try:
+    import numpy as np
     import torch
     from transformers import (
         AutoTokenizer, AutoModelForCausalLM, 
         GPT2LMHeadModel, GPT2Tokenizer,
         BloomForCausalLM, BloomTokenizerFast,
-        pipeline
+        GenerationConfig, StoppingCriteria, StoppingCriteriaList,
+        TextStreamer
     )
     from sentence_transformers import SentenceTransformer
     TRANSFORMERS_AVAILABLE = True
@@ -32,19 +42,119 @@ except ImportError as e:
     TRANSFORMERS_AVAILABLE = False
     print(f"⚠️ Install better models: pip install transformers torch accelerate")
 
+# Optional 4-bit weight quantization on GPU
+try:
+    import bitsandbytes  # noqa: F401
+    from transformers import BitsAndBytesConfig
+    BITSANDBYTES_AVAILABLE = True
+except ImportError:
+    BITSANDBYTES_AVAILABLE = False
+
+# Optional Intel Extension for PyTorch (BF16 inference on Xeon CPUs)
+try:
+    import intel_extension_for_pytorch as ipex
+    IPEX_AVAILABLE = True
+except ImportError:
+    IPEX_AVAILABLE = False
+
+# Optional Numba JIT for document chunking
+try:
+    import numpy as np
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Optional orjson for faster response serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional Aho-Corasick matcher for keyword search
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# Optional INT8 ONNX Runtime embeddings for RAG
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    ONNX_EMBEDDINGS_AVAILABLE = True
+except ImportError:
+    ONNX_EMBEDDINGS_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Precompiled patterns for response cleanup, TTS text and chunking
+_SENT_RE = re.compile(r'[.!?]+')
+_SENT_SPAN_RE = re.compile(r'[^.!?\s][^.!?]*(?:[.!?]+|$)')
+_EMOJI_RE = re.compile('[\U0001F300-\U0001FAFF\u2600-\u27BF\uFE0F]')
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_CODE_RE = re.compile(r'```.*?```', re.DOTALL)
+_WS_RE = re.compile(r'\n+')
+
+EMBEDDING_MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_EMBEDDING_DIR = Path("./data/onnx/all-MiniLM-L6-v2-int8")
+
+# Uvicorn worker processes. Each worker loads its own model and keeps its
+# own documents and conversation log, so only raise this for stateless use.
+BACKEND_WORKERS = int(os.getenv("BACKEND_WORKERS", "1"))
+
+# Micro-batching of concurrent chat generations
+BATCH_WINDOW_SECONDS = 0.008
+MAX_BATCH_SIZE = 8
+
+# Minimum cosine similarity for a semantic search hit
+SEMANTIC_MIN_SCORE = 0.25
+
+# Enhanced system prompt (not used for DialoGPT, which expects bare turns)
+SYSTEM_PROMPT = """You are an intelligent, helpful, and knowledgeable AI assistant. You provide clear, accurate, and engaging responses. You are:
+- Informative and educational
+- Conversational and friendly
+- Precise and well-structured
+- Capable of explaining complex topics simply
+- Always helpful and supportive"""
+SYSTEM_PREAMBLE = f"{SYSTEM_PROMPT}\n\n"
+
+# Longest prompt fed to generate(), in tokens
+MAX_PROMPT_TOKENS = 1024
+
 class EnhancedLLMState:
     def __init__(self):
         self.model = None
         self.tokenizer = None
         self.embedding_model = None
-        self.conversation_pipeline = None
+        self.generation_config = None
+        # KV cache of the last generated sequence, reused for a shared prompt prefix
+        self.kv_cache = None
+        self.kv_cache_ids = None
+        self.system_prompt_ids = None  # token ids of the system prompt preamble
         self.loaded = False
         self.device = "cpu"
-        self.documents = []
+        self.dtype = None  # torch.bfloat16 when the CPU model runs through IPEX
+        
+        # Uploaded documents, stored column-wise: one entry per document
+        self.doc_ids = []
+        self.doc_filenames = []
+        self.doc_contents = []
+        self.doc_content_lower = []  # lowercased once, for keyword scoring
+        self.doc_topics = []
+        self.doc_word_counts = []
+        self.doc_uploaded_at = []
+        self.doc_chunk_start = []  # first index into doc_chunks_flat
+        self.doc_chunk_count = []
+        # Chunks of all documents, back to back
+        self.doc_chunks_flat = []
+        # (embeddings, doc ids, chunk ids): normalized chunk embeddings, one
+        # row per embedded chunk, with the document and flat chunk index of
+        # each row. Replaced as one tuple so searches never see a torn index.
+        self.corpus = None
         
         # MUCH BETTER model options (in order of preference)
         self.model_options = [
@@ -83,23 +193,144 @@ class EnhancedLLMState:
         ]
         
         self.current_model_info = None
-        self.conversation_history = []
+        self.prompt_style = "system"  # "dialog" for bare-turn models like DialoGPT
+        self.conversation_history = deque(maxlen=20)  # last 10 exchanges
 
 model_state = EnhancedLLMState()
 
+class LoginRequest(BaseModel):
+    """Credentials for /auth/login"""
+    model_config = ConfigDict(extra="ignore")
+    
+    username: str = ""
+    password: str = ""
+
+class ChatRequest(BaseModel):
+    """Body of the chat endpoints; unknown client fields are ignored"""
+    model_config = ConfigDict(extra="ignore")
+    
+    message: str
+    language: str = "en"
+    use_context: bool = True
+    history: Optional[List[Dict[str, str]]] = None  # recent turns sent by the client
+    
+    @field_validator("message")
+    @classmethod
+    def message_not_blank(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("Message cannot be empty")
+        return value
+
+class ChatResponse(BaseModel):
+    """Body returned by /chat/quantized and the final streaming event"""
+    response: str
+    bot_response: str
+    tts_text: str
+    model_loaded: bool
+    model_info: Optional[Dict[str, Any]] = None
+    inference_time: Optional[float] = None
+    device: Optional[str] = None
+    quality_level: Optional[str] = None
+    error: Optional[str] = None
+
+# Chat prompts waiting for the batching worker, as (prompt, future) pairs
+generation_queue: Optional[asyncio.Queue] = None
+
+# Held for every generate() call: the batching worker and streaming
+# requests share one model and one KV cache
+generation_lock = threading.Lock()
+
+# generate() runs here, off the default pool that to_thread and /search use
+GENERATION_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+
+if TRANSFORMERS_AVAILABLE:
+    class CancelGeneration(StoppingCriteria):
+        """Stops generate() once the streaming client has gone away"""
+        
+        def __init__(self, event: threading.Event):
+            self.event = event
+        
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+    
+    class AsyncQueueStreamer(TextStreamer):
+        """Hands decoded text from the generating thread to an asyncio.Queue
+        
+        None is queued once the stream ends, including after a failure.
+        """
+        
+        def __init__(self, tokenizer, queue: asyncio.Queue, **decode_kwargs):
+            super().__init__(tokenizer, skip_prompt=True, **decode_kwargs)
+            self.loop = asyncio.get_running_loop()
+            self.queue = queue
+        
+        def on_finalized_text(self, text: str, stream_end: bool = False):
+            if text:
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+            if stream_end:
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+class QuantizedEmbeddingModel:
+    """Dynamic INT8 ONNX Runtime port of a SentenceTransformer
+    
+    The quantized model is exported once into save_dir and reused on later
+    starts. encode() mirrors the SentenceTransformer call used by the RAG code.
+    """
+    
+    def __init__(self, model_id: str, save_dir: Path, max_length: int = 256):
+        quantized_file = "model_quantized.onnx"
+        if not (save_dir / quantized_file).exists():
+            logger.info(f"🗜️ Exporting {model_id} to INT8 ONNX (one-time)...")
+            export_dir = save_dir / "fp32"
+            ORTModelForFeatureExtraction.from_pretrained(model_id, export=True).save_pretrained(export_dir)
+            AutoTokenizer.from_pretrained(model_id).save_pretrained(save_dir)
+            quantizer = ORTQuantizer.from_pretrained(export_dir)
+            qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=True)
+            quantizer.quantize(save_dir=save_dir, quantization_config=qconfig)
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(save_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(save_dir, file_name=quantized_file)
+        self.max_length = max_length
+    
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = False):
+        """Mean-pooled sentence embeddings as a float32 array"""
+        batches = []
+        for i in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[i:i + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            emb = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if normalize_embeddings:
+                emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+            batches.append(emb.astype(np.float32))
+        return np.vstack(batches)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Enhanced startup with better model loading"""
+    global generation_queue
     logger.info("🚀 Starting ENHANCED LLM Backend...")
     await load_enhanced_models()
+    generation_queue = asyncio.Queue()
+    worker = asyncio.create_task(generation_worker())
     yield
+    worker.cancel()
+    GENERATION_EXECUTOR.shutdown(wait=False, cancel_futures=True)
     logger.info("🛑 Shutting down Enhanced Backend...")
 
 app = FastAPI(
     title="Enhanced LLM Backend - Better AI Interactions",
     description="Improved LLM backend with much better AI responses",
     version="3.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
 )
 
 app.add_middleware(
@@ -110,6 +341,141 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def build_quantization_config():
+    """NF4 4-bit config for CUDA, or None to keep the FP16/FP32 path
+
+    bitsandbytes kernels need a Turing-or-newer GPU (SM >= 7.5).
+    """
+    if not BITSANDBYTES_AVAILABLE or model_state.device != "cuda":
+        return None
+    if torch.cuda.get_device_capability() < (7, 5):
+        return None
+    compute_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+    return BitsAndBytesConfig(
+        load_in_4bit=True,
+        bnb_4bit_quant_type="nf4",
+        bnb_4bit_compute_dtype=compute_dtype,
+        bnb_4bit_use_double_quant=True
+    )
+
+def optimize_cpu_model():
+    """Run the CPU model in BF16 through IPEX where available
+    
+    BF16 halves the weight bytes read per decoded token and uses AMX /
+    AVX512-BF16 on recent Xeons.
+    """
+    model_state.dtype = None
+    if not IPEX_AVAILABLE or model_state.device != "cpu":
+        return
+    
+    try:
+        model_state.model = ipex.llm.optimize(model_state.model.eval(), dtype=torch.bfloat16)
+    except Exception as e:
+        # ipex.llm only covers some architectures; the generic path covers the rest
+        logger.info(f"ipex.llm.optimize not applicable ({e}), using ipex.optimize")
+        try:
+            model_state.model = ipex.optimize(model_state.model.eval(), dtype=torch.bfloat16)
+        except Exception as e:
+            logger.warning(f"⚠️ IPEX BF16 optimization failed, staying on FP32: {e}")
+            return
+    
+    model_state.dtype = torch.bfloat16
+    logger.info("⚡ CPU model optimized for BF16 with IPEX")
+
+def compile_model_forward():
+    """Compile the CUDA decode step with CUDA graphs, keeping eager on failure
+    
+    Only the forward is compiled, so generate() and the KV cache handling are
+    unchanged. 4-bit bitsandbytes layers are left eager. A short warm-up
+    generation surfaces compile errors here rather than on the first request.
+    """
+    model = model_state.model
+    if model_state.device != "cuda" or getattr(model, "is_loaded_in_4bit", False):
+        return
+    
+    eager_forward = model.forward
+    try:
+        model.forward = torch.compile(eager_forward, mode="reduce-overhead", dynamic=True)
+        warmup = model_state.tokenizer.encode("Hello", return_tensors="pt").to(model.device)
+        with torch.inference_mode():
+            model.generate(warmup, generation_config=model_state.generation_config, max_new_tokens=2)
+        logger.info("⚡ Compiled model forward with torch.compile")
+    except Exception as e:
+        model.forward = eager_forward
+        logger.warning(f"⚠️ torch.compile unavailable, using eager forward: {e}")
+
+def load_tokenizer(name: str):
+    """Load a tokenizer with a padding token set"""
+    if "bloom" in name.lower():
+        tokenizer = BloomTokenizerFast.from_pretrained(name)
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(name)
+    
+    # Set padding token
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer
+
+def load_causal_lm(name: str, quantization_config=None):
+    """Load causal LM weights for the detected device"""
+    # Load model with better settings
+    load_kwargs = {
+        "torch_dtype": torch.float16 if model_state.device == "cuda" else torch.float32,
+        "device_map": "auto" if model_state.device == "cuda" else None,
+        "low_cpu_mem_usage": True
+    }
+    if quantization_config is not None:
+        load_kwargs["quantization_config"] = quantization_config
+    
+    if "bloom" in name.lower():
+        model = BloomForCausalLM.from_pretrained(name, **load_kwargs)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(name, **load_kwargs)
+    
+    if model_state.device == "cpu":
+        model = model.to(model_state.device)
+    return model
+
+def prepare_loaded_model():
+    """Per-model setup once tokenizer and weights are in model_state"""
+    # Build generation settings once instead of per request
+    model_state.generation_config = GenerationConfig(
+        max_new_tokens=150,
+        temperature=0.7,
+        top_p=0.9,
+        top_k=50,
+        repetition_penalty=1.2,
+        do_sample=True,
+        pad_token_id=model_state.tokenizer.eos_token_id,
+        eos_token_id=model_state.tokenizer.eos_token_id
+    )
+    model_state.kv_cache = None
+    model_state.kv_cache_ids = None
+    # The preamble is identical for every request; tokenize it once
+    model_state.system_prompt_ids = model_state.tokenizer(
+        SYSTEM_PREAMBLE, return_tensors="pt"
+    ).input_ids[0]
+    optimize_cpu_model()
+    compile_model_forward()
+
+def load_embedding_model():
+    """Load the RAG embedding model, preferring the INT8 ONNX build; None on failure"""
+    if ONNX_EMBEDDINGS_AVAILABLE:
+        try:
+            embedding_model = QuantizedEmbeddingModel(EMBEDDING_MODEL_ID, ONNX_EMBEDDING_DIR)
+            logger.info("✅ INT8 ONNX embedding model loaded for RAG")
+            return embedding_model
+        except Exception as e:
+            logger.warning(f"⚠️ ONNX embedding model failed, using SentenceTransformer: {e}")
+    
+    try:
+        embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        logger.info("✅ Embedding model loaded for RAG")
+        return embedding_model
+    except Exception as e:
+        logger.warning(f"⚠️ Embedding model failed: {e}")
+        return None
+
 async def load_enhanced_models():
     """Load MUCH BETTER models for AI interactions"""
     try:
@@ -125,6 +491,13 @@ async def load_enhanced_models():
             model_state.device = "cpu"
             logger.info("🔧 Using CPU - consider GPU for better responses")
         
+        quantization_config = build_quantization_config()
+        if quantization_config is not None:
+            logger.info("🗜️ Loading weights as 4-bit NF4 (bitsandbytes)")
+        
+        # The embedding model does not depend on the LLM; load it alongside
+        embedding_task = asyncio.create_task(asyncio.to_thread(load_embedding_model))
+        
         # Try models in order of preference
         for model_info in model_state.model_options:
             try:
@@ -135,48 +508,15 @@ async def load_enhanced_models():
                     logger.info(f"⏭️ Skipping {model_info['name']} (GPU recommended)")
                     continue
                 
-                # Load tokenizer
-                if "bloom" in model_info['name'].lower():
-                    model_state.tokenizer = BloomTokenizerFast.from_pretrained(model_info['name'])
-                else:
-                    model_state.tokenizer = AutoTokenizer.from_pretrained(model_info['name'])
-                
-                # Set padding token
-                if model_state.tokenizer.pad_token is None:
-                    model_state.tokenizer.pad_token = model_state.tokenizer.eos_token
-                
-                # Load model with better settings
-                if "bloom" in model_info['name'].lower():
-                    model_state.model = BloomForCausalLM.from_pretrained(
-                        model_info['name'],
-                        torch_dtype=torch.float16 if model_state.device == "cuda" else torch.float32,
-                        device_map="auto" if model_state.device == "cuda" else None,
-                        low_cpu_mem_usage=True
-                    )
-                else:
-                    model_state.model = AutoModelForCausalLM.from_pretrained(
-                        model_info['name'],
-                        torch_dtype=torch.float16 if model_state.device == "cuda" else torch.float32,
-                        device_map="auto" if model_state.device == "cuda" else None,
-                        low_cpu_mem_usage=True
-                    )
-                
-                if model_state.device == "cpu":
-                    model_state.model = model_state.model.to(model_state.device)
-                
-                # Create enhanced conversation pipeline
-                model_state.conversation_pipeline = pipeline(
-                    "text-generation",
-                    model=model_state.model,
-                    tokenizer=model_state.tokenizer,
-                    device=0 if model_state.device == "cuda" else -1,
-                    do_sample=True,
-                    temperature=0.7,
-                    top_p=0.9,
-                    repetition_penalty=1.2
+                # Load tokenizer and weights in parallel, off the event loop
+                model_state.tokenizer, model_state.model = await asyncio.gather(
+                    asyncio.to_thread(load_tokenizer, model_info['name']),
+                    asyncio.to_thread(load_causal_lm, model_info['name'], quantization_config)
                 )
+                await asyncio.to_thread(prepare_loaded_model)
                 
                 model_state.current_model_info = model_info
+                model_state.prompt_style = "dialog" if model_info["type"] == "dialog" else "system"
                 model_state.loaded = True
                 
                 logger.info(f"✅ Successfully loaded {model_info['name']} - Quality: {model_info['quality']}")
@@ -186,16 +526,11 @@ async def load_enhanced_models():
                 logger.warning(f"⚠️ Failed to load {model_info['name']}: {e}")
                 continue
         
+        model_state.embedding_model = await embedding_task
+        
         if not model_state.loaded:
             logger.error("❌ Could not load any enhanced models")
             return
-            
-        # Load embedding model for RAG
-        try:
-            model_state.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("✅ Embedding model loaded for RAG")
-        except Exception as e:
-            logger.warning(f"⚠️ Embedding model failed: {e}")
         
         logger.info("🎉 Enhanced LLM system ready for MUCH BETTER interactions!")
         
@@ -211,15 +546,16 @@ async def health_check():
         "model_loaded": model_state.loaded,
         "model_info": model_state.current_model_info,
         "device": model_state.device,
+        "quantized": bool(getattr(model_state.model, "is_loaded_in_4bit", False)),
         "enhancement_level": "high_quality_interactions",
         "features": ["enhanced_prompts", "better_models", "improved_generation"]
     }
 
 @app.post("/auth/login")
-async def login(credentials: Dict[str, str]):
+async def login(credentials: LoginRequest):
     """Enhanced authentication"""
-    username = credentials.get("username")
-    password = credentials.get("password")
+    username = credentials.username
+    password = credentials.password
     
     if username and password:
         return {
@@ -231,22 +567,20 @@ async def login(credentials: Dict[str, str]):
     else:
         raise HTTPException(status_code=400, detail="Username and password required")
 
-@app.post("/chat/quantized")
-async def enhanced_chat(request: Dict[str, Any]):
+@app.post("/chat/quantized", response_model=ChatResponse, response_model_exclude_none=True)
+@app.post("/chat/quantized/sync", response_model=ChatResponse, response_model_exclude_none=True)
+async def enhanced_chat(request: ChatRequest):
     """ENHANCED chat with MUCH better AI interactions"""
-    message = request.get("message", "")
-    language = request.get("language", "en")
-    use_context = request.get("use_context", True)
-    
-    if not message.strip():
-        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    message = request.message
+    use_context = request.use_context
+    history = request.history
     
     start_time = time.time()
     
     try:
         if model_state.loaded and model_state.model:
             # Generate with enhanced model
-            response = await generate_enhanced_response(message, use_context)
+            response = await generate_enhanced_response(message, use_context, history)
         else:
             # Much better fallback responses
             response = generate_premium_fallback(message)
@@ -256,93 +590,112 @@ async def enhanced_chat(request: Dict[str, Any]):
         
         # Add to conversation history for context
         if use_context:
-            model_state.conversation_history.append({
-                "role": "user",
-                "content": message,
-                "timestamp": datetime.now().isoformat()
-            })
-            model_state.conversation_history.append({
-                "role": "assistant", 
-                "content": response,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            # Keep only last 10 exchanges
-            if len(model_state.conversation_history) > 20:
-                model_state.conversation_history = model_state.conversation_history[-20:]
+            remember_exchange(message, response)
         
-        return {
-            "response": response,
-            "bot_response": response,
-            "tts_text": clean_for_tts(response),
-            "model_loaded": model_state.loaded,
-            "model_info": model_state.current_model_info,
-            "inference_time": round(inference_time, 2),
-            "device": model_state.device,
-            "quality_level": "enhanced"
-        }
+        return chat_result(response, inference_time)
         
     except Exception as e:
         logger.error(f"❌ Enhanced chat error: {e}")
-        fallback = "I apologize for the technical issue. Let me provide a helpful response while my systems recalibrate."
-        return {
-            "response": fallback,
-            "bot_response": fallback,
-            "tts_text": "Sorry for the technical issue. How can I help you?",
-            "error": str(e),
-            "model_loaded": model_state.loaded
-        }
+        return chat_error_result(e)
+
+@app.post("/chat/quantized/stream")
+async def enhanced_chat_stream(request: ChatRequest):
+    """Streaming chat: SSE `delta` events per decoded piece, then one `done` event
+    
+    The `done` event carries the same fields as /chat/quantized, with the
+    cleaned response the client should keep.
+    """
+    message = request.message
+    use_context = request.use_context
+    history = request.history
+    
+    def sse(payload: Dict[str, Any]) -> bytes:
+        body = orjson.dumps(payload) if ORJSON_AVAILABLE else json.dumps(payload).encode()
+        return b"data: " + body + b"\n\n"
+    
+    async def events():
+        start_time = time.time()
+        
+        if not (model_state.loaded and model_state.model):
+            response = generate_premium_fallback(message)
+            yield sse({"delta": response})
+            if use_context:
+                remember_exchange(message, response)
+            yield sse({"done": True, **chat_result(response, (time.time() - start_time) * 1000)})
+            return
+        
+        prompt = create_enhanced_prompt(message, use_context, history)
+        pieces: asyncio.Queue = asyncio.Queue()
+        streamer = AsyncQueueStreamer(model_state.tokenizer, pieces, skip_special_tokens=True)
+        cancel = threading.Event()
+        generation = asyncio.get_running_loop().run_in_executor(
+            GENERATION_EXECUTOR, generate_streaming, prompt, streamer, cancel
+        )
+        
+        try:
+            while True:
+                piece = await pieces.get()
+                if piece is None:
+                    break
+                yield sse({"delta": piece})
+            
+            raw = await generation
+            response = clean_and_enhance_response(raw, message) or generate_premium_fallback(message)
+        except Exception as e:
+            logger.error(f"❌ Enhanced streaming chat error: {e}")
+            yield sse({"done": True, **chat_error_result(e)})
+            return
+        finally:
+            # Client disconnects land here too; stop decoding for nobody
+            cancel.set()
+            generation.cancel()
+        
+        if use_context:
+            remember_exchange(message, response)
+        yield sse({"done": True, **chat_result(response, (time.time() - start_time) * 1000)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+def remember_exchange(message: str, response: str):
+    """Append a user/assistant exchange to the server-side conversation log"""
+    now = datetime.now()
+    model_state.conversation_history.append({"role": "user", "content": message, "timestamp": now})
+    model_state.conversation_history.append({"role": "assistant", "content": response, "timestamp": now})
+
+def chat_result(response: str, inference_time: float) -> Dict[str, Any]:
+    """Response body shared by the blocking and streaming chat endpoints"""
+    return {
+        "response": response,
+        "bot_response": response,
+        "tts_text": clean_for_tts(response),
+        "model_loaded": model_state.loaded,
+        "model_info": model_state.current_model_info,
+        "inference_time": round(inference_time, 2),
+        "device": model_state.device,
+        "quality_level": "enhanced"
+    }
 
-async def generate_enhanced_response(message: str, use_context: bool) -> str:
+def chat_error_result(error: Exception) -> Dict[str, Any]:
+    """Apologetic chat body used when generation fails"""
+    fallback = "I apologize for the technical issue. Let me provide a helpful response while my systems recalibrate."
+    return {
+        "response": fallback,
+        "bot_response": fallback,
+        "tts_text": "Sorry for the technical issue. How can I help you?",
+        "error": str(error),
+        "model_loaded": model_state.loaded
+    }
+
+async def generate_enhanced_response(message: str, use_context: bool, history: Optional[List[Dict]] = None) -> str:
     """Generate MUCH BETTER responses with enhanced prompting"""
     try:
         # Create enhanced prompt with better formatting
-        enhanced_prompt = create_enhanced_prompt(message, use_context)
-        
-        if model_state.conversation_pipeline:
-            # Use pipeline for better generation
-            result = model_state.conversation_pipeline(
-                enhanced_prompt,
-                max_new_tokens=150,
-                temperature=0.7,
-                top_p=0.9,
-                top_k=50,
-                repetition_penalty=1.2,
-                do_sample=True,
-                pad_token_id=model_state.tokenizer.eos_token_id
-            )
-            
-            response = result[0]['generated_text']
-            
-        else:
-            # Manual generation with enhanced settings
-            inputs = model_state.tokenizer.encode(
-                enhanced_prompt,
-                return_tensors="pt",
-                max_length=1024,
-                truncation=True
-            )
-            
-            inputs = inputs.to(model_state.device)
-            
-            with torch.no_grad():
-                outputs = model_state.model.generate(
-                    inputs,
-                    max_new_tokens=150,
-                    temperature=0.7,
-                    top_p=0.9,
-                    top_k=50,
-                    repetition_penalty=1.2,
-                    do_sample=True,
-                    pad_token_id=model_state.tokenizer.eos_token_id,
-                    eos_token_id=model_state.tokenizer.eos_token_id,
-                    early_stopping=True
-                )
-            
-            response = model_state.tokenizer.decode(
-                outputs[0][inputs.shape[1]:],
-                skip_special_tokens=True
-            )
+        enhanced_prompt = create_enhanced_prompt(message, use_context, history)
+        
+        # Queue for the batching worker, which may run it alongside other prompts
+        future = asyncio.get_running_loop().create_future()
+        await generation_queue.put((enhanced_prompt, future))
+        response = await future
         
         # Clean and enhance the response
         cleaned_response = clean_and_enhance_response(response, message)
@@ -353,36 +706,159 @@ async def generate_enhanced_response(message: str, use_context: bool) -> str:
         logger.error(f"Enhanced generation error: {e}")
         return generate_premium_fallback(message)
 
-def create_enhanced_prompt(message: str, use_context: bool) -> str:
-    """Create MUCH BETTER prompts for higher quality responses"""
+async def generation_worker():
+    """Coalesce prompts that arrive within BATCH_WINDOW_SECONDS into one generate() call"""
+    while True:
+        batch = [await generation_queue.get()]
+        await asyncio.sleep(BATCH_WINDOW_SECONDS)
+        try:
+            while len(batch) < MAX_BATCH_SIZE:
+                batch.append(generation_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            pass
+        
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            # Generation is blocking; keep the event loop free for other requests
+            texts = await asyncio.get_running_loop().run_in_executor(GENERATION_EXECUTOR, run_generation, prompts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+def encode_prompt(prompt: str):
+    """Token ids for a prompt, reusing the pre-tokenized system preamble"""
+    if model_state.system_prompt_ids is not None and prompt.startswith(SYSTEM_PREAMBLE):
+        suffix_ids = model_state.tokenizer(
+            prompt[len(SYSTEM_PREAMBLE):], add_special_tokens=False, return_tensors="pt"
+        ).input_ids[0]
+        ids = torch.cat([model_state.system_prompt_ids, suffix_ids])
+    else:
+        ids = model_state.tokenizer(prompt, return_tensors="pt").input_ids[0]
+    return ids[:MAX_PROMPT_TOKENS]
+
+def generate_single(prompt: str, **generate_kwargs) -> str:
+    """Generate one reply, reusing the KV cache of the previous turn's shared prefix
     
-    # Enhanced system prompt
-    system_prompt = """You are an intelligent, helpful, and knowledgeable AI assistant. You provide clear, accurate, and engaging responses. You are:
-- Informative and educational
-- Conversational and friendly
-- Precise and well-structured
-- Capable of explaining complex topics simply
-- Always helpful and supportive"""
+    The caller must hold generation_lock.
+    """
+    autocast = (torch.autocast("cpu", dtype=model_state.dtype)
+                if model_state.dtype is not None else nullcontext())
+    inputs = encode_prompt(prompt).unsqueeze(0).to(model_state.model.device)
+    
+    with torch.inference_mode(), autocast:
+        outputs = model_state.model.generate(
+            inputs,
+            attention_mask=torch.ones_like(inputs),
+            generation_config=model_state.generation_config,
+            past_key_values=reusable_kv_cache(inputs),
+            use_cache=True,
+            return_dict_in_generate=True,
+            **generate_kwargs
+        )
+    
+    sequence = outputs.sequences[0]
+    model_state.kv_cache = outputs.past_key_values
+    model_state.kv_cache_ids = sequence
+    
+    return model_state.tokenizer.decode(sequence[inputs.shape[1]:], skip_special_tokens=True)
+
+def generate_streaming(prompt: str, streamer, cancel: threading.Event) -> str:
+    """Generate one reply into an AsyncQueueStreamer; cancel stops it early"""
+    try:
+        with generation_lock:
+            return generate_single(
+                prompt,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([CancelGeneration(cancel)])
+            )
+    except Exception:
+        # Queue the end marker, or the reader would wait for tokens forever
+        streamer.end()
+        raise
+
+def run_generation(prompts: List[str]) -> List[str]:
+    """Generate a reply for each prompt; only called from the batching worker"""
+    with generation_lock:
+        if len(prompts) == 1:
+            return [generate_single(prompts[0])]
+        return generate_batch(prompts)
+
+def generate_batch(prompts: List[str]) -> List[str]:
+    """Generate replies for several prompts as one left-padded batch
+    
+    The caller must hold generation_lock.
+    """
+    autocast = (torch.autocast("cpu", dtype=model_state.dtype)
+                if model_state.dtype is not None else nullcontext())
+    
+    encoded = [encode_prompt(prompt) for prompt in prompts]
+    prompt_len = max(len(ids) for ids in encoded)
+    input_ids = torch.full((len(encoded), prompt_len), model_state.tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(encoded), prompt_len), dtype=torch.long)
+    for row, ids in enumerate(encoded):
+        input_ids[row, prompt_len - len(ids):] = ids
+        attention_mask[row, prompt_len - len(ids):] = 1
+    
+    with torch.inference_mode(), autocast:
+        sequences = model_state.model.generate(
+            input_ids.to(model_state.model.device),
+            attention_mask=attention_mask.to(model_state.model.device),
+            generation_config=model_state.generation_config,
+            use_cache=True
+        )
+    
+    return model_state.tokenizer.batch_decode(sequences[:, prompt_len:], skip_special_tokens=True)
+
+def reusable_kv_cache(input_ids):
+    """Return the previous turn's KV cache cropped to the prefix it shares with input_ids
+    
+    Only the uncached suffix of the prompt then has to be prefilled. Returns
+    None when nothing can be reused.
+    """
+    cache, cached_ids = model_state.kv_cache, model_state.kv_cache_ids
+    model_state.kv_cache = model_state.kv_cache_ids = None
+    if cache is None or cached_ids is None or not hasattr(cache, "crop"):
+        return None
+    
+    # Leave at least one prompt token for generate() to process
+    limit = min(len(cached_ids), input_ids.shape[1] - 1)
+    mismatch = (cached_ids[:limit] != input_ids[0, :limit]).nonzero()
+    common = int(mismatch[0]) if len(mismatch) else limit
+    if common == 0:
+        return None
+    
+    cache.crop(common)
+    return cache
+
+def create_enhanced_prompt(message: str, use_context: bool, history: Optional[List[Dict]] = None) -> str:
+    """Create MUCH BETTER prompts for higher quality responses
+    
+    When the client sends its own bounded `history`, that is used as context
+    instead of the server-side conversation log.
+    """
     
     # Add conversation context if available
     context_part = ""
-    if use_context and model_state.conversation_history:
-        recent_context = model_state.conversation_history[-6:]  # Last 3 exchanges
-        context_lines = []
-        for entry in recent_context:
-            role = "Human" if entry["role"] == "user" else "Assistant"
-            context_lines.append(f"{role}: {entry['content']}")
-        context_part = "\n".join(context_lines) + "\n"
-    
-    # Enhanced prompt structure
-    if "DialoGPT" in str(model_state.current_model_info):
-        # DialoGPT format
-        prompt = f"{context_part}Human: {message}\nAssistant:"
-    else:
-        # General format with system prompt
-        prompt = f"{system_prompt}\n\n{context_part}Human: {message}\nAssistant:"
+    source = history if history is not None else model_state.conversation_history
+    if use_context and source:
+        recent_context = list(source)[-6:]  # Last 3 exchanges
+        if history and history[0].get("role") == "system" and history[0] not in recent_context:
+            recent_context = [history[0]] + recent_context  # keep the earlier-turns summary
+        context_part = "\n".join(
+            entry["content"] if entry["role"] == "system"
+            else f"{'Human' if entry['role'] == 'user' else 'Assistant'}: {entry['content']}"
+            for entry in recent_context
+        ) + "\n"
     
-    return prompt
+    # DialoGPT takes bare turns; other models get the system prompt first
+    preamble = "" if model_state.prompt_style == "dialog" else SYSTEM_PREAMBLE
+    return f"{preamble}{context_part}Human: {message}\nAssistant:"
 
 def clean_and_enhance_response(response: str, original_message: str) -> str:
     """Clean and enhance the model response for much better quality"""
@@ -393,18 +869,20 @@ def clean_and_enhance_response(response: str, original_message: str) -> str:
     response = response.replace("Human:", "").replace("Assistant:", "")
     response = response.replace("You:", "").replace("AI:", "")
     
-    # Split into sentences and clean
-    sentences = re.split(r'[.!?]+', response)
+    # Split into sentences and clean in one pass
     cleaned_sentences = []
+    prev = prev2 = None  # last two kept sentences, to drop repetitions
     
-    for sentence in sentences:
+    for sentence in _SENT_RE.split(response):
         sentence = sentence.strip()
-        if sentence and len(sentence) > 3:
-            # Remove repetitions
-            if sentence not in cleaned_sentences[-2:]:
-                # Capitalize first letter
-                sentence = sentence[0].upper() + sentence[1:] if len(sentence) > 1 else sentence.upper()
-                cleaned_sentences.append(sentence)
+        if len(sentence) <= 3:
+            continue
+        # Capitalize first letter
+        sentence = sentence[0].upper() + sentence[1:]
+        if sentence == prev or sentence == prev2:
+            continue
+        cleaned_sentences.append(sentence)
+        prev, prev2 = sentence, prev
     
     if not cleaned_sentences:
         return ""
@@ -581,11 +1059,7 @@ My enhanced capabilities allow me to provide more natural, informative responses
 async def upload_document(filename: str = Form(...), content: str = Form(...)):
     """Enhanced document processing"""
     try:
-        doc_id = f"enhanced_doc_{len(model_state.documents)}"
-        
-        # Enhanced document analysis
-        word_count = len(content.split())
-        char_count = len(content)
+        doc_idx = len(model_state.doc_ids)
         
         # Extract key topics (enhanced)
         topics = extract_enhanced_topics(content)
@@ -593,27 +1067,70 @@ async def upload_document(filename: str = Form(...), content: str = Form(...)):
         # Create enhanced chunks
         chunks = create_smart_chunks(content)
         
-        document = {
-            "document_id": doc_id,
-            "filename": filename,
-            "content": content,
-            "word_count": word_count,
-            "char_count": char_count,
-            "topics": topics,
-            "chunks": chunks,
-            "chunks_created": len(chunks),
-            "uploaded_at": datetime.now().isoformat(),
-            "enhanced": True
-        }
+        chunk_start = len(model_state.doc_chunks_flat)
+        model_state.doc_chunks_flat.extend(chunks)
+        model_state.doc_chunk_start.append(chunk_start)
+        model_state.doc_chunk_count.append(len(chunks))
+        model_state.doc_filenames.append(filename)
+        model_state.doc_contents.append(content)
+        model_state.doc_content_lower.append(content.lower())
+        model_state.doc_topics.append(topics)
+        model_state.doc_word_counts.append(len(content.split()))
+        model_state.doc_uploaded_at.append(datetime.now())  # encoded as ISO 8601 in responses
+        # Appended last: a document counts once its other columns are filled
+        model_state.doc_ids.append(f"enhanced_doc_{doc_idx}")
         
-        model_state.documents.append(document)
+        await index_document_chunks(doc_idx, chunk_start, chunks)
         
-        return document
+        return document_record(doc_idx)
         
     except Exception as e:
         logger.error(f"Enhanced upload error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def document_record(doc_idx: int) -> Dict[str, Any]:
+    """Rebuild the JSON view of one stored document"""
+    start = model_state.doc_chunk_start[doc_idx]
+    chunks = model_state.doc_chunks_flat[start:start + model_state.doc_chunk_count[doc_idx]]
+    content = model_state.doc_contents[doc_idx]
+    return {
+        "document_id": model_state.doc_ids[doc_idx],
+        "filename": model_state.doc_filenames[doc_idx],
+        "content": content,
+        "word_count": model_state.doc_word_counts[doc_idx],
+        "char_count": len(content),
+        "topics": model_state.doc_topics[doc_idx],
+        "chunks": chunks,
+        "chunks_created": len(chunks),
+        "uploaded_at": model_state.doc_uploaded_at[doc_idx],
+        "enhanced": True
+    }
+
+async def index_document_chunks(doc_idx: int, chunk_start: int, chunks: List[str]):
+    """Embed a document's chunks off the event loop and append them to the search index"""
+    if model_state.embedding_model is None or not chunks:
+        return
+    
+    try:
+        emb = await asyncio.to_thread(
+            model_state.embedding_model.encode,
+            chunks, convert_to_numpy=True, normalize_embeddings=True
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Chunk embedding failed for document {doc_idx}: {e}")
+        return
+    
+    emb = emb.astype(np.float32)
+    doc_ids = np.full(len(chunks), doc_idx, dtype=np.int32)
+    chunk_ids = np.arange(chunk_start, chunk_start + len(chunks), dtype=np.int32)
+    # No await from here on, so concurrent uploads can't interleave
+    if model_state.corpus is not None:
+        old_emb, old_doc_ids, old_chunk_ids = model_state.corpus
+        emb = np.vstack([old_emb, emb])
+        doc_ids = np.concatenate([old_doc_ids, doc_ids])
+        chunk_ids = np.concatenate([old_chunk_ids, chunk_ids])
+    model_state.corpus = (emb, doc_ids, chunk_ids)
+
 def extract_enhanced_topics(content: str) -> List[str]:
     """Extract topics with better analysis"""
     topics = []
@@ -634,29 +1151,56 @@ def extract_enhanced_topics(content: str) -> List[str]:
     
     return topics[:5]  # Return top 5 topics
 
+def greedy_chunk_ends(starts, ends, chunk_size, out):
+    """Write the index of each chunk's last sentence into out; return the chunk count
+    
+    A sentence starts a new chunk when adding it would take the current chunk
+    past chunk_size characters. Works on plain lists or, under Numba, arrays.
+    """
+    n = len(ends)
+    if n == 0:
+        return 0
+    count = 0
+    first = 0
+    for i in range(1, n):
+        if ends[i] - starts[first] > chunk_size:
+            out[count] = i - 1
+            count += 1
+            first = i
+    out[count] = n - 1
+    return count + 1
+
+if NUMBA_AVAILABLE:
+    greedy_chunk_ends_jit = njit(cache=True)(greedy_chunk_ends)
+
 def create_smart_chunks(content: str, chunk_size: int = 400) -> List[str]:
-    """Create smarter document chunks"""
-    # Split by sentences first
-    sentences = re.split(r'[.!?]+', content)
-    chunks = []
-    current_chunk = ""
+    """Create smarter document chunks
     
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
-            
-        if len(current_chunk) + len(sentence) > chunk_size:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-                current_chunk = sentence
-            else:
-                chunks.append(sentence)
-        else:
-            current_chunk += " " + sentence if current_chunk else sentence
+    Chunk boundaries are decided on sentence offsets, then each chunk is
+    sliced out of the original text once.
+    """
+    # Sentence spans, including their closing punctuation
+    spans = [m.span() for m in _SENT_SPAN_RE.finditer(content)]
+    if not spans:
+        return []
     
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+    if NUMBA_AVAILABLE:
+        offsets = np.array(spans, dtype=np.int64)
+        starts, ends = offsets[:, 0].copy(), offsets[:, 1].copy()
+        last = np.empty(len(spans), dtype=np.int64)
+        count = greedy_chunk_ends_jit(starts, ends, chunk_size, last)
+        last = last[:count].tolist()
+        starts, ends = starts.tolist(), ends.tolist()
+    else:
+        starts, ends = [s for s, _ in spans], [e for _, e in spans]
+        last = [0] * len(spans)
+        last = last[:greedy_chunk_ends(starts, ends, chunk_size, last)]
+    
+    chunks = []
+    first = 0
+    for i in last:
+        chunks.append(content[starts[first]:ends[i]].strip())
+        first = i + 1
     
     return chunks
 
@@ -664,56 +1208,15 @@ def create_smart_chunks(content: str, chunk_size: int = 400) -> List[str]:
 async def enhanced_search(query: str, limit: int = 5):
     """Enhanced document search"""
     try:
-        if not model_state.documents:
+        if not model_state.doc_ids:
             return {"results": [], "total_documents": 0, "query": query}
         
-        results = []
-        query_lower = query.lower()
-        query_words = query_lower.split()
-        
-        for doc in model_state.documents:
-            content_lower = doc["content"].lower()
-            
-            # Enhanced relevance scoring
-            relevance_score = 0
-            matches = 0
-            
-            # Exact phrase match (highest weight)
-            if query_lower in content_lower:
-                matches += content_lower.count(query_lower)
-                relevance_score += matches * 30
-            
-            # Individual word matches
-            for word in query_words:
-                if word in content_lower:
-                    word_matches = content_lower.count(word)
-                    matches += word_matches
-                    relevance_score += word_matches * 10
-            
-            # Topic relevance
-            for topic in doc.get("topics", []):
-                if any(word in topic.lower() for word in query_words):
-                    relevance_score += 20
-            
-            if relevance_score > 0:
-                # Get enhanced preview
-                preview = get_enhanced_preview(doc["content"], query_lower)
-                
-                results.append({
-                    "filename": doc["filename"],
-                    "content_preview": preview,
-                    "relevance_score": min(100, relevance_score),
-                    "matches": matches,
-                    "topics": doc.get("topics", []),
-                    "word_count": doc.get("word_count", 0)
-                })
-        
-        # Sort by relevance
-        results.sort(key=lambda x: x["relevance_score"], reverse=True)
+        # Scoring is CPU-bound; keep it off the event loop
+        results = await asyncio.to_thread(rank_documents, query, limit)
         
         return {
             "results": results[:limit],
-            "total_documents": len(model_state.documents),
+            "total_documents": len(model_state.doc_ids),
             "query": query,
             "enhanced": True
         }
@@ -722,18 +1225,130 @@ async def enhanced_search(query: str, limit: int = 5):
         logger.error(f"Enhanced search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def get_enhanced_preview(content: str, query: str) -> str:
-    """Get better preview with context"""
-    content_lower = content.lower()
+def rank_documents(query: str, limit: int) -> List[Dict[str, Any]]:
+    """Score documents for a query, best first (runs in a worker thread)"""
+    results = []
+    query_lower = query.lower()
+    query_words = query_lower.split()
+    matcher = build_word_matcher(query_words)
+    
+    # Read the index once; uploads publish a new tuple rather than mutating it
+    corpus = model_state.corpus
+    num_docs = len(model_state.doc_ids)
     
-    # Find first occurrence
-    pos = content_lower.find(query)
-    if pos == -1:
+    if corpus is not None:
+        corpus_emb, corpus_doc_ids, corpus_chunk_ids = corpus
+        
+        # Semantic search: one matmul over all chunk embeddings
+        q = model_state.embedding_model.encode(
+            [query], convert_to_numpy=True, normalize_embeddings=True
+        )[0].astype(np.float32)
+        scores = corpus_emb @ q
+        
+        # Best-scoring row per document
+        doc_best = np.full(num_docs, -1.0, dtype=np.float32)
+        np.maximum.at(doc_best, corpus_doc_ids, scores)
+        
+        k = min(limit, num_docs)
+        top = np.argpartition(-doc_best, k - 1)[:k] if k > 0 else np.empty(0, dtype=np.int64)
+        top = top[np.argsort(-doc_best[top])]
+        
+        for doc_idx in top.tolist():
+            semantic = float(doc_best[doc_idx])
+            if semantic < SEMANTIC_MIN_SCORE:
+                break
+            
+            # Keyword hits only nudge the semantic score
+            keyword_score, matches, match_pos = keyword_relevance(doc_idx, query_lower, query_words, matcher)
+            relevance_score = round(semantic * 100) + min(20, keyword_score // 5)
+            
+            if match_pos != -1:
+                preview = get_enhanced_preview(model_state.doc_contents[doc_idx], match_pos, len(query_lower))
+            else:
+                doc_rows = np.flatnonzero(corpus_doc_ids == doc_idx)
+                best_row = doc_rows[np.argmax(scores[doc_rows])]
+                preview = model_state.doc_chunks_flat[corpus_chunk_ids[best_row]]
+            
+            results.append(search_result(doc_idx, preview, relevance_score, matches))
+    else:
+        for doc_idx in range(num_docs):
+            relevance_score, matches, match_pos = keyword_relevance(doc_idx, query_lower, query_words, matcher)
+            
+            if relevance_score > 0:
+                # Get enhanced preview
+                preview = get_enhanced_preview(model_state.doc_contents[doc_idx], match_pos, len(query_lower))
+                results.append(search_result(doc_idx, preview, relevance_score, matches))
+    
+    # Sort by relevance
+    results.sort(key=lambda x: x["relevance_score"], reverse=True)
+    return results
+
+def search_result(doc_idx: int, preview: str, relevance_score: int, matches: int) -> Dict[str, Any]:
+    """JSON view of one search hit"""
+    return {
+        "filename": model_state.doc_filenames[doc_idx],
+        "content_preview": preview,
+        "relevance_score": min(100, relevance_score),
+        "matches": matches,
+        "topics": model_state.doc_topics[doc_idx],
+        "word_count": model_state.doc_word_counts[doc_idx]
+    }
+
+def build_word_matcher(query_words: List[str]):
+    """Aho-Corasick automaton over the query words, or None if unavailable
+    
+    Each word's value is how often it appears in the query, so repeated
+    words weigh the same as with per-word counting.
+    """
+    if not AHOCORASICK_AVAILABLE or not query_words:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for word in set(query_words):
+        automaton.add_word(word, query_words.count(word))
+    automaton.make_automaton()
+    return automaton
+
+def keyword_relevance(doc_idx: int, query_lower: str, query_words: List[str], matcher=None):
+    """Keyword relevance score, match count and first phrase offset (-1 if none) for one document"""
+    content_lower = model_state.doc_content_lower[doc_idx]
+    relevance_score = 0
+    matches = 0
+    
+    # Exact phrase match (highest weight)
+    match_pos = content_lower.find(query_lower)
+    if match_pos != -1:
+        matches += content_lower.count(query_lower, match_pos)
+        relevance_score += matches * 30
+    
+    # Individual word matches
+    if matcher is not None:
+        # One pass over the document for all query words
+        word_matches = sum(weight for _, weight in matcher.iter(content_lower))
+        matches += word_matches
+        relevance_score += word_matches * 10
+    else:
+        for word in query_words:
+            if word in content_lower:
+                word_matches = content_lower.count(word)
+                matches += word_matches
+                relevance_score += word_matches * 10
+    
+    # Topic relevance
+    for topic in model_state.doc_topics[doc_idx]:
+        if any(word in topic.lower() for word in query_words):
+            relevance_score += 20
+    
+    return relevance_score, matches, match_pos
+
+def get_enhanced_preview(content: str, match_pos: int, query_len: int) -> str:
+    """Get better preview with context around a known match offset (-1 for none)"""
+    if match_pos == -1:
         return content[:200] + "..." if len(content) > 200 else content
     
     # Get context around the match
-    start = max(0, pos - 100)
-    end = min(len(content), pos + len(query) + 100)
+    start = max(0, match_pos - 100)
+    end = min(len(content), match_pos + query_len + 100)
     
     preview = content[start:end]
     
@@ -751,7 +1366,7 @@ async def get_enhanced_model_status():
         "loaded": model_state.loaded,
         "model_info": model_state.current_model_info,
         "device": model_state.device,
-        "documents_count": len(model_state.documents),
+        "documents_count": len(model_state.doc_ids),
         "conversation_length": len(model_state.conversation_history),
         "enhancement_level": "premium",
         "available_models": model_state.model_options,
@@ -766,15 +1381,13 @@ async def get_enhanced_model_status():
 
 def clean_for_tts(text: str) -> str:
     """Enhanced TTS cleaning"""
-    import re
-    
     # Remove emojis and special characters
-    text = re.sub(r'[🤖✅⚠️❌🛠️🟢🎉🚀💡📚🔧🎯]', '', text)
+    text = _EMOJI_RE.sub('', text)
     
     # Remove markdown
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'```.*?```', '', text, flags=re.DOTALL)
-    text = re.sub(r'\n+', '. ', text)
+    text = _BOLD_RE.sub(r'\1', text)
+    text = _CODE_RE.sub('', text)
+    text = _WS_RE.sub('. ', text)
     
     # Clean up for speech
     text = text.replace('AI', 'A I')
@@ -799,9 +1412,11 @@ if __name__ == "__main__":
     print("")
     print("🧠 This will provide MUCH better AI interactions!")
     
+    # Multiple workers need an import string rather than the app object
     uvicorn.run(
-        app,
+        f"{Path(__file__).stem}:app" if BACKEND_WORKERS > 1 else app,
         host="0.0.0.0", 
         port=8000,
+        workers=BACKEND_WORKERS,
         log_level="info"
     )
\ No newline at end of file
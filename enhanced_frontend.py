@@ -4,17 +4,34 @@ Enhanced Frontend for Quantized LLM Chatbot - Phase 5 Extension
 Builds on existing gradio_ui.py with working AI interaction and document upload
 """
 
+import asyncio
+import codecs
 import gradio as gr
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import time
 import logging
 import os
+import re
 import hashlib
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple, Any
+from typing import List, Dict, Optional, Tuple, Any, AsyncIterator
 from pathlib import Path
 
+# Optional orjson for faster request/event (de)serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,37 +40,139 @@ logger = logging.getLogger(__name__)
 API_BASE = "http://localhost:8000"
 UPLOAD_DIR = Path("./data/documents")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_CHUNK_SIZE = 64 * 1024
+HEALTH_CHECK_TTL = 5.0  # seconds a /health result is reused
+MODEL_STATUS_TTL = 30.0  # seconds a /models/status result is reused
+# Gradio queue limits: chat/search are I/O-bound awaits, uploads are bandwidth-bound
+CHAT_CONCURRENCY = 10
+UPLOAD_CONCURRENCY = 2
+QUEUE_MAX_SIZE = 64
+IO_WORKERS = 8
+MAX_HISTORY_TURNS = 50  # chat turns kept per session and shown in the chatbot
+CONTEXT_MESSAGES = 6  # recent messages sent to the backend as context
+
+# Keep-alive connection pool for the synchronous /health probe, which also
+# runs at startup outside Gradio's event loop. Retries only apply to GETs.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=10, pool_maxsize=50,
+                       max_retries=Retry(total=2, backoff_factor=0.1))
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
+
+# Async client for the Gradio handlers, so a slow backend call awaits
+# instead of holding a worker thread
+ASYNC_CLIENT = httpx.AsyncClient(
+    base_url=API_BASE,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    timeout=30.0
+)
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+def _dumps(payload: Any) -> bytes:
+    """Serialize a request body to JSON bytes"""
+    return orjson.dumps(payload) if ORJSON_AVAILABLE else json.dumps(payload).encode('utf-8')
+
+def _loads(data) -> Any:
+    """Parse a JSON response body or SSE event"""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+# Disk reads run here so a slow file never stalls Gradio's event loop
+_IO_EXECUTOR = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="frontend-io")
+
+async def _run_io(fn, *args):
+    """Run a blocking file call on the I/O pool"""
+    return await asyncio.get_running_loop().run_in_executor(_IO_EXECUTOR, fn, *args)
+
+# Patterns for clean_for_tts, compiled once
+_EMOJI_TABLE = {ord(c): None for c in "🤖🎓🚀📊🧠❌🚫⚡🔥💡🎤🔊📚🌍🐳💾📄🔍🎯"}
+_EMPHASIS_RE = re.compile(r'\*{1,2}(.*?)\*{1,2}')
+_NL_RE = re.compile(r'\n+')
+_JARGON_RE = re.compile(r'\b(LLM|API|AI|RAG)\b')
+_JARGON_SPOKEN = {"LLM": "Language Model", "API": "A P I", "AI": "A I", "RAG": "R A G"}
+
+# Client-side hook run when the hidden TTS box changes
+_SPEAK_TTS_JS = """
+(txt) => {
+    if (txt && txt.length > 10 && window.speakText) {
+        window.speakText(txt);
+    }
+    return [];
+}
+"""
 
-# Global state
+# Per-session state, held in a gr.State so users never share a login
 class ChatbotState:
     def __init__(self):
         self.auth_token = None
+        self.auth_headers = {}
         self.username = None
-        self.conversation_history = []
+        self.uploaded_hashes = set()  # SHA-256 of files already sent this session
+        self.conversation_history = deque(maxlen=2 * MAX_HISTORY_TURNS)
         self.current_language = "en"
         self.voice_enabled = True
-        self.backend_connected = False
+    
+    def set_token(self, token: Optional[str]):
+        """Store the token and build its Authorization header once"""
+        self.auth_token = token
+        self.auth_headers = {"Authorization": f"Bearer {token}"} if token else {}
 
-state = ChatbotState()
+# Backend health is shared by every session. Time of the last completed
+# /health probe; one probe runs at a time
+_backend_connected = False
+_last_health_ts = 0.0
+_health_lock = threading.Lock()
 
 def check_backend_connection() -> bool:
-    """Check if your Phase 5 backend is running"""
+    """Check if your Phase 5 backend is running (cached for HEALTH_CHECK_TTL)"""
+    global _backend_connected, _last_health_ts
+    if time.monotonic() - _last_health_ts < HEALTH_CHECK_TTL:
+        return _backend_connected
+    
+    with _health_lock:
+        # Another caller may have finished a probe while we waited
+        if time.monotonic() - _last_health_ts < HEALTH_CHECK_TTL:
+            return _backend_connected
+        
+        connected = False
+        try:
+            response = SESSION.get(f"{API_BASE}/health", timeout=5)
+            connected = response.status_code == 200
+        except requests.RequestException as e:
+            logger.debug("health probe failed: %s", e)
+        
+        _backend_connected = connected
+        # Stamped after the probe, so a slow probe still counts as fresh
+        _last_health_ts = time.monotonic()
+        return connected
+
+# Last /models/status body and when it was fetched; shared by all sessions
+_model_status: Optional[Dict[str, Any]] = None
+_model_status_ts = 0.0
+
+async def fetch_model_status() -> Optional[Dict[str, Any]]:
+    """Backend model status (cached for MODEL_STATUS_TTL); None if unavailable"""
+    global _model_status, _model_status_ts
+    if _model_status is not None and time.monotonic() - _model_status_ts < MODEL_STATUS_TTL:
+        return _model_status
+    
     try:
-        response = requests.get(f"{API_BASE}/health", timeout=5)
-        if response.status_code == 200:
-            state.backend_connected = True
-            return True
-    except:
-        state.backend_connected = False
-    return False
+        model_response = await ASYNC_CLIENT.get("/models/status", timeout=5)
+        if model_response.status_code == 200:
+            _model_status = _loads(model_response.content)
+            _model_status_ts = time.monotonic()
+            return _model_status
+    except (httpx.HTTPError, ValueError) as e:
+        logger.debug("model status unavailable: %s", e)
+    return None
 
-def login_user(username: str, password: str) -> str:
+async def login_user(state: ChatbotState, username: str, password: str) -> Tuple[str, ChatbotState]:
     """Login with your existing backend"""
     if not username or not password:
-        return "❌ Please enter both username and password"
+        return "❌ Please enter both username and password", state
     
     try:
-        if not check_backend_connection():
+        if not await asyncio.to_thread(check_backend_connection):
             return """🚫 **Backend Not Connected**
             
 Please start your Phase 5 backend first:
@@ -61,25 +180,26 @@ Please start your Phase 5 backend first:
 cd /home/zen/quantized-llm-chatbot
 python enhanced_backend.py
 ```
-Then refresh and try logging in again."""
+Then refresh and try logging in again.""", state
         
-        response = requests.post(
-            f"{API_BASE}/auth/login",
-            json={"username": username, "password": password},
-            timeout=10
+        # Model status doesn't depend on the login, so fetch both at once
+        response, model_info = await asyncio.gather(
+            ASYNC_CLIENT.post(
+                "/auth/login",
+                content=_dumps({"username": username, "password": password}),
+                headers=JSON_HEADERS,
+                timeout=10
+            ),
+            fetch_model_status()
         )
         
         if response.status_code == 200:
-            data = response.json()
-            state.auth_token = data.get("access_token")
+            data = _loads(response.content)
+            state.set_token(data.get("access_token"))
             state.username = username
             
-            # Get model status
-            try:
-                model_response = requests.get(f"{API_BASE}/models/status", timeout=5)
-                if model_response.status_code == 200:
-                    model_info = model_response.json()
-                    return f"""✅ **Welcome {username}! Phase 5 Backend Connected**
+            if model_info is not None:
+                return f"""✅ **Welcome {username}! Phase 5 Backend Connected**
 
 🤖 **Quantized LLM Status:**
 - Model Loaded: {'✅' if model_info.get('loaded') else '⚠️ Loading...'}  
@@ -87,10 +207,7 @@ Then refresh and try logging in again."""
 - Device: {model_info.get('device', 'CPU')}
 - Documents: {model_info.get('documents_count', 0)} uploaded
 
-🚀 **Ready for AI interaction!**"""
-                
-            except:
-                pass
+🚀 **Ready for AI interaction!**""", state
             
             return f"""✅ **Welcome {username}!**
             
@@ -99,76 +216,107 @@ Then refresh and try logging in again."""
 📚 Document processing active
 🧠 AI backend connected
 
-**Start chatting with your AI!** 🚀"""
+**Start chatting with your AI!** 🚀""", state
         else:
-            return "❌ **Login Failed** - Check credentials"
+            return "❌ **Login Failed** - Check credentials", state
             
     except Exception as e:
-        return f"🚫 **Connection Error** - {str(e)}"
+        return f"🚫 **Connection Error** - {str(e)}", state
 
-def chat_with_ai(message: str, history: List) -> Tuple[List, str, str]:
-    """Enhanced chat that actually connects to your AI backend"""
+async def chat_with_ai(state: ChatbotState, message: str, history: List) -> AsyncIterator[Tuple[List, str, str]]:
+    """Enhanced chat that streams your AI backend's reply into the chatbot"""
     if not state.auth_token:
         if history is None:
             history = []
         history.append([message, "🔐 **Please log in first to access the AI!**"])
-        return history, "", ""
+        yield history, "", ""
+        return
     
     if not message.strip():
-        return history, "", ""
+        yield history, "", ""
+        return
     
-    if history is None:
-        history = []
+    # Bounded, so the payload re-sent to the browser each update stays flat
+    history = list(history or [])[-(MAX_HISTORY_TURNS - 1):]
     
-    if not state.backend_connected:
-        check_backend_connection()
-        if not state.backend_connected:
+    if not _backend_connected:
+        await asyncio.to_thread(check_backend_connection)
+        if not _backend_connected:
             history.append([message, "🚫 **Backend Disconnected** - Please start your Phase 5 backend server first."])
-            return history, "", ""
+            yield history, "", ""
+            return
+    
+    # Placeholder turn the streamed pieces are written into
+    history.append([message, ""])
     
     try:
         # Send to your quantized LLM backend
-        response = requests.post(
-            f"{API_BASE}/chat/quantized",
-            json={
+        async with ASYNC_CLIENT.stream(
+            "POST",
+            "/chat/quantized/stream",
+            content=_dumps({
                 "message": message,
                 "language": state.current_language,
                 "use_context": True,
+                "history": list(state.conversation_history)[-CONTEXT_MESSAGES:],
                 "voice_mode": True,
                 "max_tokens": 256
-            },
-            headers={"Authorization": f"Bearer {state.auth_token}"} if state.auth_token else {},
+            }),
+            headers={**state.auth_headers, **JSON_HEADERS},
             timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            ai_response = result.get("response", "")
-            
-            # Show model info if available
-            if result.get("model_loaded"):
-                model_info = f"🧠 **Quantized AI Response** ({result.get('inference_time', 0)}ms)"
-                ai_response = f"{model_info}\n\n{ai_response}"
+        ) as response:
             
-            # Add to conversation history
-            history.append([message, ai_response])
+            if response.status_code == 401:
+                state.set_token(None)
+                history[-1][1] = "🔐 **Session expired - please log in again**"
+                yield history, "", ""
+                return
             
-            # Get TTS text
-            tts_text = result.get("tts_text", clean_for_tts(ai_response))
+            if response.status_code != 200:
+                history[-1][1] = f"❌ **AI Error** - Status {response.status_code}"
+                yield history, "", "Sorry, the AI model encountered an error."
+                return
             
-            return history, "", tts_text
+            partial = ""
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = _loads(line[6:])
+                
+                if "delta" in event:
+                    partial += event["delta"]
+                    history[-1][1] = partial
+                    yield history, "", ""
+                    continue
+                
+                if event.get("done"):
+                    ai_response = event.get("response", partial)
+                    if "error" not in event:
+                        state.conversation_history.append({"role": "user", "content": message})
+                        state.conversation_history.append({"role": "assistant", "content": ai_response})
+                    
+                    # Show model info if available
+                    if event.get("model_loaded"):
+                        model_info = f"🧠 **Quantized AI Response** ({event.get('inference_time', 0)}ms)"
+                        ai_response = f"{model_info}\n\n{ai_response}"
+                    
+                    history[-1][1] = ai_response
+                    
+                    # Get TTS text
+                    tts_text = event.get("tts_text", clean_for_tts(ai_response))
+                    
+                    yield history, "", tts_text
+                    return
             
-        else:
-            error_msg = f"❌ **AI Error** - Status {response.status_code}"
-            history.append([message, error_msg])
-            return history, "", "Sorry, the AI model encountered an error."
+            # Stream closed without a done event; keep what arrived
+            history[-1][1] = partial or "❌ **AI Error** - Empty response"
+            yield history, "", clean_for_tts(partial)
             
     except Exception as e:
-        error_msg = f"🚫 **Error:** {str(e)}"
-        history.append([message, error_msg])
-        return history, "", "Connection issue occurred. Please check the backend."
+        history[-1][1] = f"🚫 **Error:** {str(e)}"
+        yield history, "", "Connection issue occurred. Please check the backend."
 
-def upload_document(files) -> str:
+async def upload_document(state: ChatbotState, files) -> str:
     """Upload documents to your Phase 5 backend"""
     if not state.auth_token:
         return "❌ Please log in first"
@@ -176,64 +324,25 @@ def upload_document(files) -> str:
     if not files:
         return "❌ No files selected"
     
-    if not state.backend_connected:
-        check_backend_connection()
-        if not state.backend_connected:
+    if not _backend_connected:
+        await asyncio.to_thread(check_backend_connection)
+        if not _backend_connected:
             return "🚫 **Backend Not Connected** - Please start your Phase 5 backend server first."
     
     try:
-        uploaded_files = []
         files_list = files if isinstance(files, list) else [files]
         
-        for file in files_list:
-            if hasattr(file, 'name'):
-                filename = file.name
-                
-                # Read file content
-                try:
-                    if hasattr(file, 'read'):
-                        content = file.read()
-                    else:
-                        with open(file, 'rb') as f:
-                            content = f.read()
-                    
-                    # Handle different file types
-                    if isinstance(content, bytes):
-                        try:
-                            text_content = content.decode('utf-8')
-                        except UnicodeDecodeError:
-                            text_content = content.decode('utf-8', errors='ignore')
-                    else:
-                        text_content = str(content)
-                    
-                    # Send to backend
-                    response = requests.post(
-                        f"{API_BASE}/documents",
-                        data={
-                            "filename": filename,
-                            "content": text_content
-                        },
-                        headers={"Authorization": f"Bearer {state.auth_token}"} if state.auth_token else {},
-                        timeout=30
-                    )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        uploaded_files.append({
-                            "filename": result.get("filename"),
-                            "language": result.get("language"),
-                            "word_count": result.get("word_count"),
-                            "chunks": result.get("chunks_created")
-                        })
-                    
-                except Exception as e:
-                    logger.error(f"Error processing {filename}: {e}")
-                    continue
+        # Upload all files concurrently over the shared client; each is a temp-file path
+        results = await asyncio.gather(*(_upload_one(path, state) for path in files_list if path))
+        uploaded_files = [info for info in results if info is not None]
         
         if uploaded_files:
             result_html = "✅ **Documents Uploaded Successfully!**\n\n"
             
             for file_info in uploaded_files:
+                if file_info.get('duplicate'):
+                    result_html += f"📄 **{file_info['filename']}** - already uploaded, skipped\n\n"
+                    continue
                 result_html += f"""📄 **{file_info['filename']}**
 - Language: {file_info.get('language', 'Unknown')}
 - Words: {file_info.get('word_count', 0)}
@@ -250,7 +359,68 @@ def upload_document(files) -> str:
         logger.error(f"Upload error: {e}")
         return f"❌ Upload failed: {str(e)}"
 
-def search_documents(query: str) -> str:
+async def _iter_upload_body(fields: Dict[str, str], stream_name: str, path: str, boundary: str) -> AsyncIterator[bytes]:
+    """Multipart/form-data body with one text field streamed from the file
+    
+    The file is read and UTF-8 decoded in UPLOAD_CHUNK_SIZE pieces, so
+    memory stays flat whatever the file size. Invalid bytes are dropped.
+    """
+    for name, value in fields.items():
+        yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+               f'{value}\r\n').encode('utf-8')
+    yield (f'--{boundary}\r\nContent-Disposition: form-data; name="{stream_name}"\r\n'
+           f'Content-Type: text/plain; charset=utf-8\r\n\r\n').encode('utf-8')
+    
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    fh = await _run_io(open, path, 'rb')
+    try:
+        while chunk := await _run_io(fh.read, UPLOAD_CHUNK_SIZE):
+            yield decoder.decode(chunk).encode('utf-8')
+        yield decoder.decode(b'', final=True).encode('utf-8')
+    finally:
+        await _run_io(fh.close)
+    yield f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+def _file_sha256(path: str) -> str:
+    """SHA-256 of a file, hashed in C by OpenSSL without loading it whole"""
+    with open(path, 'rb') as fh:
+        return hashlib.file_digest(fh, 'sha256').hexdigest()
+
+async def _upload_one(path: str, state: ChatbotState) -> Optional[Dict[str, Any]]:
+    """Stream one file to the backend; returns its summary, or None on failure"""
+    filename = Path(path).name
+    
+    try:
+        # Skip the round-trip for content this session already sent
+        digest = await _run_io(_file_sha256, path)
+        if digest in state.uploaded_hashes:
+            return {"filename": filename, "duplicate": True}
+        
+        boundary = uuid.uuid4().hex
+        response = await ASYNC_CLIENT.post(
+            "/documents",
+            content=_iter_upload_body({"filename": filename}, "content", path, boundary),
+            headers={**state.auth_headers, "Content-Type": f"multipart/form-data; boundary={boundary}"},
+            timeout=30
+        )
+        
+        if response.status_code == 200:
+            result = _loads(response.content)
+            state.uploaded_hashes.add(digest)
+            return {
+                "filename": result.get("filename"),
+                "language": result.get("language"),
+                "word_count": result.get("word_count"),
+                "chunks": result.get("chunks_created")
+            }
+        if response.status_code == 401:
+            state.set_token(None)
+        
+    except Exception as e:
+        logger.error(f"Error processing {filename}: {e}")
+    return None
+
+async def search_documents(state: ChatbotState, query: str) -> str:
     """Search through uploaded documents using your Phase 5 backend"""
     if not state.auth_token:
         return "❌ Please log in first"
@@ -258,21 +428,21 @@ def search_documents(query: str) -> str:
     if not query.strip():
         return "❌ Please enter a search query"
     
-    if not state.backend_connected:
-        check_backend_connection()
-        if not state.backend_connected:
+    if not _backend_connected:
+        await asyncio.to_thread(check_backend_connection)
+        if not _backend_connected:
             return "🚫 **Backend Not Connected** - Please start your Phase 5 backend server first."
     
     try:
-        response = requests.get(
-            f"{API_BASE}/search",
+        response = await ASYNC_CLIENT.get(
+            "/search",
             params={"query": query, "limit": 5},
-            headers={"Authorization": f"Bearer {state.auth_token}"} if state.auth_token else {},
+            headers=state.auth_headers,
             timeout=30
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = _loads(response.content)
             results = data.get("results", [])
             
             if not results:
@@ -286,6 +456,9 @@ def search_documents(query: str) -> str:
                 search_output += f"📝 {result.get('content_preview', 'No preview available')}\n\n"
             
             return search_output
+        elif response.status_code == 401:
+            state.set_token(None)
+            return "🔐 Session expired - please log in again"
         else:
             return f"❌ Search failed: {response.text}"
     
@@ -294,258 +467,241 @@ def search_documents(query: str) -> str:
 
 def clean_for_tts(text: str) -> str:
     """Clean text for text-to-speech"""
-    import re
-    
     # Remove emojis and special characters
-    text = re.sub(r'[🤖🎓🚀📊🧠❌🚫⚡🔥💡🎤🔊📚🌍🐳💾📄🔍🎯]', '', text)
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'\*(.*?)\*', r'\1', text)
-    text = re.sub(r'\n+', '. ', text)
+    text = text.translate(_EMOJI_TABLE)
+    text = _EMPHASIS_RE.sub(r'\1', text)
+    text = _NL_RE.sub('. ', text)
     
-    # Remove technical jargon for better speech
-    text = text.replace('LLM', 'Language Model')
-    text = text.replace('API', 'A P I')
-    text = text.replace('AI', 'A I')
-    text = text.replace('RAG', 'R A G')
+    # Remove technical jargon for better speech, in one pass
+    text = _JARGON_RE.sub(lambda m: _JARGON_SPOKEN[m.group(1)], text)
     
     return text.strip()
 
-def create_enhanced_interface():
-    """Create enhanced interface building on your Phase 5 system"""
-    
-    # Enhanced CSS - keeping your existing style but improved
-    custom_css = """
-    .gradio-container {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-    }
-    
-    .enhanced-card {
-        background: rgba(255, 255, 255, 0.1) !important;
-        backdrop-filter: blur(15px) !important;
-        border-radius: 20px !important;
-        padding: 25px !important;
-        margin: 15px 0 !important;
-        border: 1px solid rgba(255, 255, 255, 0.2) !important;
-        box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1) !important;
-    }
-    
-    .voice-btn {
-        background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%) !important;
-        border: 3px solid white !important;
-        border-radius: 50% !important;
-        width: 120px !important;
-        height: 120px !important;
-        font-size: 3em !important;
-        color: white !important;
-        cursor: pointer !important;
-        transition: all 0.3s ease !important;
-        margin: 20px auto !important;
-        display: block !important;
-    }
-    
-    .voice-btn:hover {
-        transform: scale(1.1) !important;
-        box-shadow: 0 15px 40px rgba(79, 172, 254, 0.6) !important;
-    }
-    
-    .listening {
-        background: linear-gradient(135deg, #4CAF50, #45a049) !important;
-        animation: pulse 1.5s infinite !important;
-    }
-    
-    @keyframes pulse {
-        0%, 100% { transform: scale(1); }
-        50% { transform: scale(1.05); }
-    }
-    
-    .status-connected {
-        color: #4CAF50 !important;
-        font-weight: bold !important;
-    }
-    
-    .status-disconnected {
-        color: #f44336 !important;
-        font-weight: bold !important;
-    }
-    """
-    
-    # Enhanced JavaScript for voice - building on your existing system
-    voice_js = """
-    <script>
-    console.log('🚀 Initializing Enhanced Phase 5 Voice System...');
-    
-    let recognition = null;
-    let isListening = false;
-    let speechSynthesis = window.speechSynthesis;
-    let lastTTSText = '';
-    
-    function initVoice() {
-        if ('webkitSpeechRecognition' in window) {
-            recognition = new webkitSpeechRecognition();
-            recognition.continuous = false;
-            recognition.interimResults = true;
-            recognition.lang = 'en-US';
-            
-            recognition.onstart = function() {
-                console.log('🎤 Voice recognition started');
-                isListening = true;
-                updateVoiceUI('listening');
-                updateStatus('🎤 Listening for your question...');
-            };
+# Enhanced CSS - keeping your existing style but improved
+_CUSTOM_CSS = """
+.gradio-container {
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+}
+
+.enhanced-card {
+    background: rgba(255, 255, 255, 0.1) !important;
+    backdrop-filter: blur(15px) !important;
+    border-radius: 20px !important;
+    padding: 25px !important;
+    margin: 15px 0 !important;
+    border: 1px solid rgba(255, 255, 255, 0.2) !important;
+    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.1) !important;
+}
+
+.voice-btn {
+    background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%) !important;
+    border: 3px solid white !important;
+    border-radius: 50% !important;
+    width: 120px !important;
+    height: 120px !important;
+    font-size: 3em !important;
+    color: white !important;
+    cursor: pointer !important;
+    transition: all 0.3s ease !important;
+    margin: 20px auto !important;
+    display: block !important;
+}
+
+.voice-btn:hover {
+    transform: scale(1.1) !important;
+    box-shadow: 0 15px 40px rgba(79, 172, 254, 0.6) !important;
+}
+
+.listening {
+    background: linear-gradient(135deg, #4CAF50, #45a049) !important;
+    animation: pulse 1.5s infinite !important;
+}
+
+@keyframes pulse {
+    0%, 100% { transform: scale(1); }
+    50% { transform: scale(1.05); }
+}
+
+.status-connected {
+    color: #4CAF50 !important;
+    font-weight: bold !important;
+}
+
+.status-disconnected {
+    color: #f44336 !important;
+    font-weight: bold !important;
+}
+"""
+
+# Enhanced JavaScript for voice - building on your existing system
+_VOICE_JS = """
+<script>
+console.log('🚀 Initializing Enhanced Phase 5 Voice System...');
+
+let recognition = null;
+let isListening = false;
+let speechSynthesis = window.speechSynthesis;
+
+function initVoice() {
+    if ('webkitSpeechRecognition' in window) {
+        recognition = new webkitSpeechRecognition();
+        recognition.continuous = false;
+        recognition.interimResults = true;
+        recognition.lang = 'en-US';
+        
+        recognition.onstart = function() {
+            console.log('🎤 Voice recognition started');
+            isListening = true;
+            updateVoiceUI('listening');
+            updateStatus('🎤 Listening for your question...');
+        };
+        
+        recognition.onresult = function(event) {
+            let finalTranscript = '';
+            let interimTranscript = '';
             
-            recognition.onresult = function(event) {
-                let finalTranscript = '';
-                let interimTranscript = '';
-                
-                for (let i = event.resultIndex; i < event.results.length; i++) {
-                    if (event.results[i].isFinal) {
-                        finalTranscript += event.results[i][0].transcript;
-                    } else {
-                        interimTranscript += event.results[i][0].transcript;
-                    }
-                }
-                
-                if (interimTranscript) {
-                    updateStatus('🎤 Hearing: "' + interimTranscript + '"...');
+            for (let i = event.resultIndex; i < event.results.length; i++) {
+                if (event.results[i].isFinal) {
+                    finalTranscript += event.results[i][0].transcript;
+                } else {
+                    interimTranscript += event.results[i][0].transcript;
                 }
-                
-                if (finalTranscript) {
-                    console.log('🎤 Recognized:', finalTranscript);
-                    const confidence = event.results[event.results.length - 1][0].confidence || 0.8;
-                    fillMessageInput(finalTranscript);
-                    updateStatus('✅ Got it! "' + finalTranscript + '" (Confidence: ' + Math.round(confidence * 100) + '%)');
-                }
-            };
+            }
             
-            recognition.onend = function() {
-                console.log('🎤 Voice recognition ended');
-                isListening = false;
-                updateVoiceUI('ready');
-                updateStatus('🎤 Click microphone to speak again');
-            };
+            if (interimTranscript) {
+                updateStatus('🎤 Hearing: "' + interimTranscript + '"...');
+            }
             
-            recognition.onerror = function(event) {
-                console.error('🚫 Voice error:', event.error);
-                isListening = false;
-                updateVoiceUI('error');
-                let errorMessage = '';
-                switch(event.error) {
-                    case 'network':
-                        errorMessage = '📶 Network issue - Check your connection';
-                        break;
-                    case 'not-allowed':
-                        errorMessage = '🎤 Please allow microphone access';
-                        break;
-                    case 'no-speech':
-                        errorMessage = '🤫 No speech detected - Try speaking louder';
-                        break;
-                    default:
-                        errorMessage = '❌ Voice error: ' + event.error;
-                }
-                updateStatus(errorMessage);
-            };
-        } else {
-            console.warn('⚠️ Speech recognition not supported');
-            updateStatus('❌ Voice not supported - Use Chrome/Edge');
-        }
-    }
-    
-    function startVoice() {
-        if (!recognition) {
-            initVoice();
-        }
+            if (finalTranscript) {
+                console.log('🎤 Recognized:', finalTranscript);
+                const confidence = event.results[event.results.length - 1][0].confidence || 0.8;
+                fillMessageInput(finalTranscript);
+                updateStatus('✅ Got it! "' + finalTranscript + '" (Confidence: ' + Math.round(confidence * 100) + '%)');
+            }
+        };
         
-        if (isListening) {
-            recognition.stop();
-            updateStatus('🛑 Stopping voice recognition...');
-        } else {
-            recognition.start();
-            updateStatus('🎤 Starting voice recognition...');
-        }
-    }
-    
-    function fillMessageInput(text) {
-        const textareas = document.getElementsByTagName('textarea');
-        for (let textarea of textareas) {
-            if (textarea.placeholder && 
-                (textarea.placeholder.includes('message') || 
-                 textarea.placeholder.includes('Ask'))) {
-                textarea.value = text;
-                textarea.dispatchEvent(new Event('input', { bubbles: true }));
-                textarea.focus();
-                break;
+        recognition.onend = function() {
+            console.log('🎤 Voice recognition ended');
+            isListening = false;
+            updateVoiceUI('ready');
+            updateStatus('🎤 Click microphone to speak again');
+        };
+        
+        recognition.onerror = function(event) {
+            console.error('🚫 Voice error:', event.error);
+            isListening = false;
+            updateVoiceUI('error');
+            let errorMessage = '';
+            switch(event.error) {
+                case 'network':
+                    errorMessage = '📶 Network issue - Check your connection';
+                    break;
+                case 'not-allowed':
+                    errorMessage = '🎤 Please allow microphone access';
+                    break;
+                case 'no-speech':
+                    errorMessage = '🤫 No speech detected - Try speaking louder';
+                    break;
+                default:
+                    errorMessage = '❌ Voice error: ' + event.error;
             }
-        }
+            updateStatus(errorMessage);
+        };
+    } else {
+        console.warn('⚠️ Speech recognition not supported');
+        updateStatus('❌ Voice not supported - Use Chrome/Edge');
     }
-    
-    function updateVoiceUI(state) {
-        const btn = document.getElementById('voice-btn');
-        if (btn) {
-            btn.className = 'voice-btn' + (state === 'listening' ? ' listening' : '');
-            if (state === 'listening') {
-                btn.textContent = '🔴';
-                btn.title = 'Listening... Click to stop';
-            } else if (state === 'error') {
-                btn.textContent = '❌';
-                btn.title = 'Voice error - Click to retry';
-            } else {
-                btn.textContent = '🎤';
-                btn.title = 'Click to start voice input';
-            }
-        }
+}
+
+function startVoice() {
+    if (!recognition) {
+        initVoice();
     }
     
-    function updateStatus(message) {
-        const statusElements = document.querySelectorAll('.voice-status');
-        statusElements.forEach(element => {
-            element.textContent = message;
-        });
-        console.log('Status:', message);
+    if (isListening) {
+        recognition.stop();
+        updateStatus('🛑 Stopping voice recognition...');
+    } else {
+        recognition.start();
+        updateStatus('🎤 Starting voice recognition...');
     }
-    
-    function speakText(text) {
-        if (speechSynthesis && text && text.trim()) {
-            speechSynthesis.cancel();
-            
-            const utterance = new SpeechSynthesisUtterance(text);
-            utterance.rate = 0.8;
-            utterance.pitch = 1.0;
-            utterance.volume = 1.0;
-            
-            utterance.onstart = () => updateStatus('🔊 AI is speaking...');
-            utterance.onend = () => updateStatus('🎤 Click microphone to continue');
-            
-            speechSynthesis.speak(utterance);
+}
+
+function fillMessageInput(text) {
+    const textareas = document.getElementsByTagName('textarea');
+    for (let textarea of textareas) {
+        if (textarea.placeholder && 
+            (textarea.placeholder.includes('message') || 
+             textarea.placeholder.includes('Ask'))) {
+            textarea.value = text;
+            textarea.dispatchEvent(new Event('input', { bubbles: true }));
+            textarea.focus();
+            break;
         }
     }
-    
-    // Auto-speak TTS responses from your backend
-    setInterval(function() {
-        const ttsElements = document.querySelectorAll('textarea');
-        for (let element of ttsElements) {
-            if (element.style.display === 'none' && element.value && element.value !== lastTTSText) {
-                lastTTSText = element.value;
-                if (element.value.length > 10) {
-                    speakText(element.value);
-                }
-                break;
-            }
+}
+
+function updateVoiceUI(state) {
+    const btn = document.getElementById('voice-btn');
+    if (btn) {
+        btn.className = 'voice-btn' + (state === 'listening' ? ' listening' : '');
+        if (state === 'listening') {
+            btn.textContent = '🔴';
+            btn.title = 'Listening... Click to stop';
+        } else if (state === 'error') {
+            btn.textContent = '❌';
+            btn.title = 'Voice error - Click to retry';
+        } else {
+            btn.textContent = '🎤';
+            btn.title = 'Click to start voice input';
         }
-    }, 1500);
-    
-    // Initialize when page loads
-    document.addEventListener('DOMContentLoaded', function() {
-        setTimeout(initVoice, 1000);
-        updateStatus('🎤 Voice system ready - Click microphone to start');
+    }
+}
+
+function updateStatus(message) {
+    const statusElements = document.querySelectorAll('.voice-status');
+    statusElements.forEach(element => {
+        element.textContent = message;
     });
+    console.log('Status:', message);
+}
+
+function speakText(text) {
+    if (speechSynthesis && text && text.trim()) {
+        speechSynthesis.cancel();
+        
+        const utterance = new SpeechSynthesisUtterance(text);
+        utterance.rate = 0.8;
+        utterance.pitch = 1.0;
+        utterance.volume = 1.0;
+        
+        utterance.onstart = () => updateStatus('🔊 AI is speaking...');
+        utterance.onend = () => updateStatus('🎤 Click microphone to continue');
+        
+        speechSynthesis.speak(utterance);
+    }
+}
+
+// Initialize when page loads
+document.addEventListener('DOMContentLoaded', function() {
+    setTimeout(initVoice, 1000);
+    updateStatus('🎤 Voice system ready - Click microphone to start');
+});
+
+window.startVoice = startVoice;
+window.speakText = speakText;
+</script>
+"""
+
+def create_enhanced_interface():
+    """Create enhanced interface building on your Phase 5 system"""
     
-    window.startVoice = startVoice;
-    </script>
-    """
-    
-    with gr.Blocks(css=custom_css, title="🤖 Quantized LLM Chatbot - Phase 5 Enhanced") as app:
+    with gr.Blocks(css=_CUSTOM_CSS, head=_VOICE_JS, title="🤖 Quantized LLM Chatbot - Phase 5 Enhanced") as app:
+        
+        # Login and history live per browser session
+        session_state = gr.State(ChatbotState())
         
         # Header
         gr.HTML("""
@@ -648,7 +804,8 @@ def create_enhanced_interface():
                 file_upload = gr.File(
                     label="📎 Upload Documents",
                     file_types=[".txt", ".md", ".pdf", ".docx"],
-                    file_count="multiple"
+                    file_count="multiple",
+                    type="filepath"
                 )
                 upload_btn = gr.Button("📤 Process with AI", variant="primary")
                 upload_result = gr.HTML("""
@@ -670,34 +827,59 @@ def create_enhanced_interface():
                 </div>
                 """)
         
-        # JavaScript
-        gr.HTML(voice_js)
-        
         # Event handlers
-        login_btn.click(login_user, inputs=[username_input, password_input], outputs=[login_status])
+        login_btn.click(
+            login_user,
+            inputs=[session_state, username_input, password_input],
+            outputs=[login_status, session_state]
+        )
         
         send_btn.click(
-            chat_with_ai, 
-            inputs=[message_input, chatbot], 
-            outputs=[chatbot, message_input, tts_output]
+            chat_with_ai,
+            inputs=[session_state, message_input, chatbot],
+            outputs=[chatbot, message_input, tts_output],
+            concurrency_limit=CHAT_CONCURRENCY
         )
         
         voice_chat_btn.click(
-            lambda msg, hist: chat_with_ai(msg, hist),
-            inputs=[message_input, chatbot],
-            outputs=[chatbot, message_input, tts_output]
+            chat_with_ai,
+            inputs=[session_state, message_input, chatbot],
+            outputs=[chatbot, message_input, tts_output],
+            concurrency_limit=CHAT_CONCURRENCY
         )
         
         message_input.submit(
             chat_with_ai,
-            inputs=[message_input, chatbot],
-            outputs=[chatbot, message_input, tts_output]
+            inputs=[session_state, message_input, chatbot],
+            outputs=[chatbot, message_input, tts_output],
+            concurrency_limit=CHAT_CONCURRENCY
         )
         
         clear_btn.click(lambda: ([], ""), outputs=[chatbot, message_input])
         
-        upload_btn.click(upload_document, inputs=[file_upload], outputs=[upload_result])
-        search_btn.click(search_documents, inputs=[search_input], outputs=[search_results])
+        upload_btn.click(
+            upload_document,
+            inputs=[session_state, file_upload],
+            outputs=[upload_result],
+            concurrency_limit=UPLOAD_CONCURRENCY
+        )
+        # Auto-speak TTS responses from your backend as soon as they arrive
+        tts_output.change(
+            fn=None,
+            inputs=[tts_output],
+            outputs=None,
+            js=_SPEAK_TTS_JS
+        )
+        
+        search_btn.click(
+            search_documents,
+            inputs=[session_state, search_input],
+            outputs=[search_results],
+            concurrency_limit=CHAT_CONCURRENCY
+        )
+    
+    # Let concurrent users' handlers overlap instead of running one at a time
+    app.queue(default_concurrency_limit=CHAT_CONCURRENCY, max_size=QUEUE_MAX_SIZE)
     
     return app
 
@@ -3,28 +3,85 @@
 FIXED Backend - Resolves all FastAPI and model loading issues
 """
 
+import argparse
 import asyncio
 import logging
+import os
+import platform
+import re
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from functools import lru_cache
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
+# Pin the OpenMP/MKL pools before torch is imported so CPU inference does
+# not oversubscribe cores shared with uvicorn workers and the tokenizer
+CPU_THREADS = str(max(1, (os.cpu_count() or 2) // 2))
+os.environ.setdefault("OMP_NUM_THREADS", CPU_THREADS)
+os.environ.setdefault("MKL_NUM_THREADS", CPU_THREADS)
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
 from fastapi import FastAPI, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 import uvicorn
 
+from src.nlp.text import count_words
+
 # AI/ML imports with better error handling
 try:
     import torch
     from transformers import AutoTokenizer, AutoModelForCausalLM
     from sentence_transformers import SentenceTransformer
+    torch.set_num_threads(int(os.environ["OMP_NUM_THREADS"]))
+    torch.set_num_interop_threads(1)
     TRANSFORMERS_AVAILABLE = True
     print("✅ PyTorch and Transformers available")
 except ImportError as e:
     TRANSFORMERS_AVAILABLE = False
     print(f"⚠️ Transformers not available: {e}")
 
+# Optional bitsandbytes for 8/4-bit CUDA weights
+try:
+    import bitsandbytes  # noqa: F401
+    from transformers import BitsAndBytesConfig
+    BITSANDBYTES_AVAILABLE = True
+except ImportError:
+    BITSANDBYTES_AVAILABLE = False
+
+# Optional ONNX Runtime INT8 export of the chat model for CPU
+try:
+    import onnxruntime as ort
+    from optimum.onnxruntime import ORTModelForCausalLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    ONNX_RUNTIME_AVAILABLE = True
+except ImportError:
+    ONNX_RUNTIME_AVAILABLE = False
+
+# Optional numpy for the chunk index fallback
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Optional orjson for faster response serialization
+try:
+    import orjson  # noqa: F401
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional FAISS for an HNSW index over document chunk embeddings
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
 try:
     from langdetect import detect
     LANGDETECT_AVAILABLE = True
@@ -35,25 +92,129 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Weight quantization: auto (8-bit), 4bit, 8bit or none; --quantization overrides
+QUANTIZATION_MODES = ("auto", "4bit", "8bit", "none")
+QUANTIZATION = os.getenv("QUANTIZATION", "auto")
+
+# On CPU the chat model is exported once per CPU preset to INT8 ONNX under
+# this directory and run by ONNX Runtime
+ONNX_MODEL_ROOT = Path("./data/onnx")
+
+# Speculative decoding: a small draft model shares DialoGPT's GPT-2 tokenizer
+# and proposes tokens the main model verifies; --speculative turns it on
+SPECULATIVE = os.getenv("SPECULATIVE", "false").lower() == "true"
+DRAFT_MODEL_NAME = os.getenv("DRAFT_MODEL", "distilgpt2")
+NUM_ASSISTANT_TOKENS = 5
+
+# Each worker process loads its own models and keeps its own documents
+BACKEND_WORKERS = int(os.getenv("BACKEND_WORKERS", "1"))
+
+MAX_INPUT_TOKENS = 256
+MAX_NEW_TOKENS = 100
+
+# Chats arriving within BATCH_WINDOW_SECONDS share one generate() call
+BATCH_WINDOW_SECONDS = 0.01
+MAX_NUM_SEQS = int(os.getenv("MAX_NUM_SEQS", "8"))
+
+# Greedy (temperature 0) replies are deterministic, so the last few are reused
+RESPONSE_CACHE_SIZE = 1024
+
+# SentenceTransformer sorts each encode() call by length before batching
+EMBED_BATCH_SIZE = 64
+
+# Semantic search over fixed-size document chunks
+CHUNK_CHARS = 500
+HNSW_M = 32
+SEMANTIC_MIN_SCORE = 0.25
+
+_WORD_RE = re.compile(r"\w+")
+_TTS_EMOJI_TABLE = str.maketrans("", "", "🤖✅⚠️❌🛠️🟢👋📚")
+_BOLD_RE = re.compile(r"\*\*(.*?)\*\*")
+_NL_RE = re.compile(r"\n+")
+
 # Global state
 class FixedModelState:
     def __init__(self):
         self.model = None
+        self.draft_model = None
         self.tokenizer = None
         self.embedding_model = None
+        self.chunk_index = None  # ChunkIndex of document chunk embeddings
         self.loaded = False
         self.model_name = "microsoft/DialoGPT-small"
         self.documents = []
+        self.contents_lower = []  # lowercased content, parallel to documents
+        self.word_index = defaultdict(set)  # lowercase word -> indices into documents
         self.device = "cpu"
+        self.cache_implementation = None  # "static" once the compiled path is warmed up
 
 model_state = FixedModelState()
 
+# (prompt, future) pairs waiting for the batching worker; created in lifespan
+generation_queue: Optional[asyncio.Queue] = None
+
+# One dedicated thread runs every generate(): batches are serial anyway, it
+# keeps a single owner of the CUDA context, and it never waits behind
+# other asyncio.to_thread work in the default pool
+GENERATION_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="generate")
+
+# message -> future of its greedy reply, in LRU order; concurrent repeats share one future
+_greedy_cache: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+
+class ChunkIndex:
+    """Inner-product index over normalized chunk embeddings
+    
+    HNSW through FAISS when installed, otherwise one numpy matmul per
+    query. Row i belongs to document doc_ids[i] and starts at character
+    offsets[i] of it.
+    """
+    
+    def __init__(self, dim: int):
+        self.doc_ids: List[int] = []
+        self.offsets: List[int] = []
+        if FAISS_AVAILABLE:
+            faiss.omp_set_num_threads(int(os.environ["OMP_NUM_THREADS"]))
+            self.index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        else:
+            self.index = None
+            self.vectors = np.empty((0, dim), dtype=np.float32)
+    
+    def add(self, vectors, doc_idx: int, offsets: List[int]):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.index is not None:
+            self.index.add(vectors)
+        else:
+            self.vectors = np.vstack([self.vectors, vectors])
+        self.doc_ids.extend([doc_idx] * len(offsets))
+        self.offsets.extend(offsets)
+    
+    def search(self, query_vector, k: int) -> List[tuple]:
+        """Up to k (row, score) pairs, best first"""
+        k = min(k, len(self.doc_ids))
+        if k == 0:
+            return []
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        if self.index is not None:
+            scores, rows = self.index.search(query_vector[None, :], k)
+            return [(int(r), float(sc)) for r, sc in zip(rows[0], scores[0]) if r >= 0]
+        scores = self.vectors @ query_vector
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(r), float(scores[r])) for r in top]
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """FIXED: Using new FastAPI lifespan instead of on_event"""
+    global generation_queue
     logger.info("🚀 Starting Fixed Quantized LLM Backend...")
     await load_models_safely()
+    generation_queue = asyncio.Queue()
+    worker = asyncio.create_task(generation_worker())
+    if model_state.embedding_model is not None and NUMPY_AVAILABLE:
+        model_state.chunk_index = ChunkIndex(model_state.embedding_model.get_sentence_embedding_dimension())
     yield
+    worker.cancel()
+    GENERATION_EXECUTOR.shutdown(wait=False, cancel_futures=True)
     logger.info("🛑 Shutting down Fixed Backend...")
 
 # FIXED: Updated FastAPI app with new lifespan
@@ -61,7 +222,8 @@ app = FastAPI(
     title="FIXED Quantized LLM Backend",
     description="Fixed backend with no warnings or errors",
     version="2.0.0",
-    lifespan=lifespan  # FIXED: New FastAPI syntax
+    lifespan=lifespan,  # FIXED: New FastAPI syntax
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
 )
 
 app.add_middleware(
@@ -90,17 +252,17 @@ async def load_models_safely():
             model_state.tokenizer = AutoTokenizer.from_pretrained(model_state.model_name)
             if model_state.tokenizer.pad_token is None:
                 model_state.tokenizer.pad_token = model_state.tokenizer.eos_token
+            # Batched prompts are padded on the left so replies start together
+            model_state.tokenizer.padding_side = "left"
             
-            # FIXED: Load model without deprecated torch_dtype parameter
-            model_state.model = AutoModelForCausalLM.from_pretrained(
-                model_state.model_name,
-                dtype=torch.float16 if torch.cuda.is_available() else torch.float32,  # FIXED: Use dtype instead of torch_dtype
-                low_cpu_mem_usage=True,
-                device_map="auto" if torch.cuda.is_available() else None
-            )
-            
-            if not torch.cuda.is_available():
-                model_state.model = model_state.model.to(model_state.device)
+            model_state.model = load_onnx_model() if model_state.device == "cpu" else None
+            if model_state.model is None:
+                model_state.model = load_causal_lm()
+                if not torch.cuda.is_available():
+                    model_state.model = model_state.model.to(model_state.device)
+                    quantize_cpu_model()
+            compile_model_forward()
+            load_draft_model()
             
             # Load embedding model
             model_state.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
@@ -116,6 +278,188 @@ async def load_models_safely():
         logger.info("💡 Try: pip install accelerate torch transformers")
         model_state.loaded = False
 
+def load_causal_lm():
+    """Load the chat model with the fastest attention kernel that works
+    
+    FlashAttention-2 on CUDA, PyTorch SDPA otherwise, and eager attention
+    as the last resort if a kernel isn't installed or supported.
+    """
+    load_kwargs = {}
+    quantization_config = build_quantization_config()
+    if quantization_config is not None:
+        load_kwargs["quantization_config"] = quantization_config
+    
+    if torch.cuda.is_available():
+        # BF16 on Ampere and newer, FP16 before that
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        attn_choices = ("flash_attention_2", "sdpa", "eager")
+    else:
+        dtype = torch.float32
+        attn_choices = ("sdpa", "eager")
+    
+    for attn_implementation in attn_choices:
+        try:
+            # FIXED: Load model without deprecated torch_dtype parameter
+            model = AutoModelForCausalLM.from_pretrained(
+                model_state.model_name,
+                dtype=dtype,  # FIXED: Use dtype instead of torch_dtype
+                low_cpu_mem_usage=True,
+                device_map="auto" if torch.cuda.is_available() else None,
+                attn_implementation=attn_implementation,
+                **load_kwargs
+            )
+            logger.info(f"🔧 Attention implementation: {attn_implementation}")
+            return model
+        except (ImportError, ValueError) as e:
+            if attn_implementation == attn_choices[-1]:
+                raise
+            logger.info(f"💡 {attn_implementation} unavailable ({e}), trying the next kernel")
+
+def build_quantization_config():
+    """bitsandbytes config for CUDA, or None to load full-precision weights"""
+    if QUANTIZATION == "none" or model_state.device != "cuda" or not BITSANDBYTES_AVAILABLE:
+        return None
+    if QUANTIZATION == "4bit":
+        return BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.float16
+        )
+    return BitsAndBytesConfig(load_in_8bit=True)
+
+def load_onnx_model():
+    """INT8 ONNX Runtime port of the chat model for CPU, or None
+    
+    The export and dynamic quantization run once per CPU preset and are
+    reused on later starts. --quantization none, a missing optimum
+    install or a failed export keeps the PyTorch path.
+    """
+    if QUANTIZATION == "none" or not ONNX_RUNTIME_AVAILABLE:
+        return None
+    
+    target = onnx_quantization_target()
+    model_dir = ONNX_MODEL_ROOT / f"{model_state.model_name.split('/')[-1]}-int8-{target}"
+    quantized_file = "model_quantized.onnx"
+    try:
+        if not (model_dir / quantized_file).exists():
+            logger.info(f"🗜️ Exporting {model_state.model_name} to INT8 ONNX for {target} (one-time)...")
+            export_dir = model_dir / "fp32"
+            ORTModelForCausalLM.from_pretrained(model_state.model_name, export=True).save_pretrained(export_dir)
+            quantizer = ORTQuantizer.from_pretrained(export_dir, file_name="model.onnx")
+            preset = getattr(AutoQuantizationConfig, target)
+            if target in ("avx2", "avx512"):
+                # Without VNNI, U8S8 products can saturate unless weights keep to 7 bits
+                qconfig = preset(is_static=False, per_channel=True, reduce_range=True)
+            else:
+                qconfig = preset(is_static=False, per_channel=True)
+            quantizer.quantize(save_dir=model_dir, quantization_config=qconfig)
+        
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.intra_op_num_threads = int(os.environ["OMP_NUM_THREADS"])
+        session_options.inter_op_num_threads = 1
+        model = ORTModelForCausalLM.from_pretrained(
+            model_dir,
+            file_name=quantized_file,
+            provider="CPUExecutionProvider",
+            session_options=session_options
+        )
+        logger.info("⚡ CPU model running on ONNX Runtime INT8")
+        return model
+    except Exception as e:
+        logger.warning(f"⚠️ ONNX Runtime unavailable, using PyTorch: {e}")
+        return None
+
+def onnx_quantization_target() -> str:
+    """optimum quantization preset for this CPU: arm64, avx512_vnni, avx512 or avx2"""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    try:
+        flags = set(Path("/proc/cpuinfo").read_text().split())
+    except OSError:
+        flags = set()
+    if "avx512_vnni" in flags:
+        return "avx512_vnni"
+    if "avx512f" in flags:
+        return "avx512"
+    return "avx2"
+
+def conv1d_to_linear(model):
+    """Swap GPT-2 style Conv1D layers for equivalent nn.Linear layers
+    
+    DialoGPT keeps its attention and MLP weights in transformers' Conv1D,
+    which quantize_dynamic doesn't recognise; as nn.Linear they get INT8.
+    """
+    from transformers.pytorch_utils import Conv1D
+    
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, name, linear)
+    return model
+
+def quantize_cpu_model():
+    """Dynamic INT8 weight quantization of the CPU model's linear layers"""
+    if QUANTIZATION == "none":
+        return
+    if QUANTIZATION == "4bit":
+        logger.info("💡 4-bit weights need CUDA; using INT8 on CPU")
+    
+    try:
+        model = conv1d_to_linear(model_state.model.eval())
+        model_state.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info("⚡ CPU model quantized to INT8")
+    except Exception as e:
+        logger.warning(f"⚠️ INT8 quantization failed, staying on FP32: {e}")
+
+def compile_model_forward():
+    """Compile the CUDA forward and switch generation to a static KV cache
+    
+    bitsandbytes and INT8 layers stay eager, so this only applies with
+    --quantization none. An 8-token warm-up pays the compile cost here
+    instead of on the first request; any failure keeps the eager path.
+    """
+    model = model_state.model
+    if model_state.device != "cuda" or getattr(model, "is_quantized", False) or SPECULATIVE:
+        return
+    
+    eager_forward = model.forward
+    try:
+        model.forward = torch.compile(eager_forward, mode="reduce-overhead", fullgraph=True)
+        warmup = torch.full((1, 8), model_state.tokenizer.eos_token_id, device=model.device)
+        with torch.no_grad():
+            model.generate(
+                warmup,
+                max_new_tokens=2,
+                cache_implementation="static",
+                pad_token_id=model_state.tokenizer.eos_token_id
+            )
+        model_state.cache_implementation = "static"
+        logger.info("⚡ Compiled model forward with a static KV cache")
+    except Exception as e:
+        model.forward = eager_forward
+        model_state.cache_implementation = None
+        logger.warning(f"⚠️ torch.compile unavailable, using eager forward: {e}")
+
+def load_draft_model():
+    """Load the speculative-decoding draft model when SPECULATIVE is set"""
+    if not SPECULATIVE:
+        return
+    try:
+        model_state.draft_model = AutoModelForCausalLM.from_pretrained(
+            DRAFT_MODEL_NAME,
+            dtype=getattr(model_state.model, "dtype", torch.float32),
+            low_cpu_mem_usage=True
+        ).to(model_state.model.device).eval()
+        logger.info(f"⚡ Speculative decoding with draft model {DRAFT_MODEL_NAME}")
+    except Exception as e:
+        model_state.draft_model = None
+        logger.warning(f"⚠️ Draft model unavailable, decoding normally: {e}")
+
 @app.get("/health")
 async def health_check():
     """Health check with detailed status"""
@@ -148,14 +492,18 @@ async def chat_quantized(request: Dict[str, Any]):
     """FIXED: Chat endpoint with better error handling"""
     message = request.get("message", "")
     language = request.get("language", "en")
+    temperature = request.get("temperature", 0.7)
     
     if not message.strip():
         raise HTTPException(status_code=400, detail="Message cannot be empty")
     
     try:
         if model_state.loaded and model_state.model:
-            # Generate with loaded model
-            response = await generate_with_model(message)
+            # Generate with loaded model; greedy replies come from the cache
+            if temperature == 0:
+                response = await generate_greedy_cached(message)
+            else:
+                response = await generate_with_model(message)
         else:
             # Fallback response
             response = generate_smart_fallback(message)
@@ -180,37 +528,124 @@ async def chat_quantized(request: Dict[str, Any]):
         }
 
 async def generate_with_model(message: str) -> str:
-    """Generate response with loaded model"""
+    """Generate response with loaded model, batched with concurrent requests"""
     try:
-        inputs = model_state.tokenizer.encode(
-            f"Human: {message}\nAssistant:",
-            return_tensors="pt",
-            max_length=256,
-            truncation=True
-        )
-        
-        inputs = inputs.to(model_state.device)
-        
-        with torch.no_grad():
-            outputs = model_state.model.generate(
-                inputs,
-                max_new_tokens=100,
-                do_sample=True,
-                temperature=0.7,
-                pad_token_id=model_state.tokenizer.eos_token_id
-            )
-        
-        response = model_state.tokenizer.decode(
-            outputs[0][inputs.shape[1]:],
-            skip_special_tokens=True
-        ).strip()
+        future = asyncio.get_running_loop().create_future()
+        await generation_queue.put((f"Human: {message}\nAssistant:", future))
+        response = (await future).strip()
+        return response or generate_smart_fallback(message)
         
+    except Exception as e:
+        logger.error(f"Model generation error: {e}")
+        return generate_smart_fallback(message)
+
+async def generate_greedy_cached(message: str) -> str:
+    """Greedy reply for a message, reusing an earlier or in-flight generation"""
+    future = _greedy_cache.get(message)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            GENERATION_EXECUTOR, generate_one, f"Human: {message}\nAssistant:", False
+        )
+        _greedy_cache[message] = future
+        if len(_greedy_cache) > RESPONSE_CACHE_SIZE:
+            _greedy_cache.popitem(last=False)
+    else:
+        _greedy_cache.move_to_end(message)
+    
+    try:
+        # Shielded so one caller disconnecting doesn't cancel it for the others
+        response = (await asyncio.shield(future)).strip()
         return response or generate_smart_fallback(message)
         
     except Exception as e:
+        if _greedy_cache.get(message) is future:
+            del _greedy_cache[message]
         logger.error(f"Model generation error: {e}")
         return generate_smart_fallback(message)
 
+async def generation_worker():
+    """Coalesce prompts that arrive within BATCH_WINDOW_SECONDS into one generate() call"""
+    while True:
+        batch = [await generation_queue.get()]
+        await asyncio.sleep(BATCH_WINDOW_SECONDS)
+        try:
+            while len(batch) < MAX_NUM_SEQS:
+                batch.append(generation_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            pass
+        
+        prompts = [prompt for prompt, _ in batch]
+        try:
+            # Tokenize, generate and decode off the event loop
+            texts = await asyncio.get_running_loop().run_in_executor(GENERATION_EXECUTOR, generate_batch, prompts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+def generate_batch(prompts: List[str]) -> List[str]:
+    """Left-padded batched generation; returns one reply per prompt"""
+    if model_state.draft_model is not None:
+        # Assisted generation only supports a batch of one
+        return [generate_one(prompt) for prompt in prompts]
+    
+    inputs = model_state.tokenizer(
+        prompts,
+        return_tensors="pt",
+        padding=True,
+        max_length=MAX_INPUT_TOKENS,
+        truncation=True
+    ).to(model_state.model.device)
+    
+    with torch.no_grad():
+        outputs = model_state.model.generate(
+            **inputs,
+            max_new_tokens=MAX_NEW_TOKENS,
+            do_sample=True,
+            temperature=0.7,
+            pad_token_id=model_state.tokenizer.eos_token_id,
+            cache_implementation=model_state.cache_implementation
+        )
+    
+    return model_state.tokenizer.batch_decode(
+        outputs[:, inputs["input_ids"].shape[1]:],
+        skip_special_tokens=True
+    )
+
+def generate_one(prompt: str, do_sample: bool = True) -> str:
+    """One unbatched reply, with the draft model proposing tokens when loaded"""
+    inputs = model_state.tokenizer(
+        prompt,
+        return_tensors="pt",
+        max_length=MAX_INPUT_TOKENS,
+        truncation=True
+    ).to(model_state.model.device)
+    
+    if model_state.draft_model is not None:
+        generate_kwargs = {"assistant_model": model_state.draft_model,
+                           "num_assistant_tokens": NUM_ASSISTANT_TOKENS}
+    else:
+        generate_kwargs = {"cache_implementation": model_state.cache_implementation}
+    
+    with torch.no_grad():
+        outputs = model_state.model.generate(
+            **inputs,
+            max_new_tokens=MAX_NEW_TOKENS,
+            do_sample=do_sample,
+            temperature=0.7 if do_sample else None,
+            pad_token_id=model_state.tokenizer.eos_token_id,
+            **generate_kwargs
+        )
+    
+    return model_state.tokenizer.decode(outputs[0, inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+
+@lru_cache(maxsize=RESPONSE_CACHE_SIZE)
 def generate_smart_fallback(message: str) -> str:
     """Smart fallback responses when model isn't available"""
     message_lower = message.lower()
@@ -274,17 +709,25 @@ async def upload_document(filename: str = Form(...), content: str = Form(...)):
             except:
                 language = "auto-detected"
         
+        offsets = list(range(0, len(content), CHUNK_CHARS)) or [0]
         document = {
             "document_id": doc_id,
             "filename": filename,
             "content": content,
-            "word_count": len(content.split()),
+            "word_count": count_words(content),
             "language": language,
-            "chunks_created": max(1, len(content) // 500),
+            "chunks_created": len(offsets),
             "uploaded_at": datetime.now().isoformat()
         }
         
+        # Lowercase once here, not on every search
+        content_lower = content.lower()
+        model_state.contents_lower.append(content_lower)
         model_state.documents.append(document)
+        doc_idx = len(model_state.documents) - 1
+        index_document_words(doc_idx, content_lower)
+        
+        await index_document_chunks(doc_idx, content, offsets)
         
         return document
         
@@ -299,18 +742,29 @@ async def search_documents(query: str, limit: int = 5):
         if not model_state.documents:
             return {"results": [], "total_documents": 0, "query": query}
         
-        results = []
         query_lower = query.lower()
+        if model_state.chunk_index is not None and model_state.chunk_index.doc_ids:
+            results = await semantic_search(query, query_lower, limit)
+            return {
+                "results": results,
+                "total_documents": len(model_state.documents),
+                "query": query
+            }
         
-        for doc in model_state.documents:
-            content_lower = doc["content"].lower()
-            if query_lower in content_lower:
+        results = []
+        candidates = candidate_documents(query_lower)
+        doc_indices = range(len(model_state.documents)) if candidates is None else sorted(candidates)
+        
+        for i in doc_indices:
+            doc = model_state.documents[i]
+            content_lower = model_state.contents_lower[i]
+            start = content_lower.find(query_lower)
+            if start >= 0:
                 # Calculate simple relevance
                 matches = content_lower.count(query_lower)
                 relevance = min(90, 60 + matches * 10)
                 
                 # Get preview
-                start = content_lower.find(query_lower)
                 preview_start = max(0, start - 50)
                 preview_end = min(len(doc["content"]), start + 200)
                 preview = doc["content"][preview_start:preview_end]
@@ -335,6 +789,89 @@ async def search_documents(query: str, limit: int = 5):
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def index_document_chunks(doc_idx: int, content: str, offsets: List[int]):
+    """Embed a document's CHUNK_CHARS-sized chunks into the chunk index"""
+    if model_state.chunk_index is None:
+        return
+    chunks = [content[start:start + CHUNK_CHARS] for start in offsets]
+    try:
+        vectors = await asyncio.to_thread(encode_texts, chunks)
+    except Exception as e:
+        logger.warning(f"⚠️ Chunk embedding failed for {doc_idx}: {e}")
+        return
+    model_state.chunk_index.add(vectors, doc_idx, offsets)
+
+def encode_texts(texts: List[str]):
+    """Normalized embeddings for texts, in order (blocking)"""
+    return model_state.embedding_model.encode(texts, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=True)
+
+async def semantic_search(query: str, query_lower: str, limit: int) -> List[Dict[str, Any]]:
+    """Documents ranked by their best-matching chunk embedding"""
+    index = model_state.chunk_index
+    query_vector = (await asyncio.to_thread(encode_texts, [query]))[0]
+    
+    # Several chunks can belong to one document, so over-fetch before grouping
+    best: Dict[int, tuple] = {}
+    for row, score in index.search(query_vector, limit * 4):
+        doc_idx = index.doc_ids[row]
+        if score >= SEMANTIC_MIN_SCORE and doc_idx not in best:
+            best[doc_idx] = (row, score)
+        if len(best) == limit:
+            break
+    
+    results = []
+    for doc_idx, (row, score) in best.items():
+        doc = model_state.documents[doc_idx]
+        content_lower = model_state.contents_lower[doc_idx]
+        start = content_lower.find(query_lower)
+        if start >= 0:
+            preview_start = max(0, start - 50)
+            preview = doc["content"][preview_start:start + 200]
+        else:
+            offset = index.offsets[row]
+            preview = doc["content"][offset:offset + 250]
+        
+        results.append({
+            "filename": doc["filename"],
+            "content_preview": preview,
+            "relevance_score": round(score * 100),
+            "matches": content_lower.count(query_lower) if start >= 0 else 0
+        })
+    return results
+
+def index_document_words(doc_index: int, content_lower: str):
+    """Add a document's distinct words to the inverted index"""
+    for word in set(_WORD_RE.findall(content_lower)):
+        model_state.word_index[word].add(doc_index)
+
+def candidate_documents(query_lower: str) -> Optional[set]:
+    """Indices of documents that can contain the query, or None to scan all
+    
+    A substring match needs every inner query word as a whole word, the
+    first word as the end of some word and the last as the start of one
+    (a lone word may sit anywhere inside one). Only the index vocabulary
+    is scanned, never document text; matches are verified by the caller.
+    """
+    words = _WORD_RE.findall(query_lower)
+    if not words:
+        return None
+    
+    index = model_state.word_index
+    
+    def postings(predicate) -> set:
+        return set().union(*(docs for word, docs in index.items() if predicate(word)))
+    
+    if len(words) == 1:
+        return postings(lambda word: words[0] in word)
+    
+    first, *middle, last = words
+    candidates = postings(lambda word: word.endswith(first))
+    for word in middle:
+        candidates &= index.get(word, set())
+    if candidates:
+        candidates &= postings(lambda word: word.startswith(last))
+    return candidates
+
 @app.get("/models/status")
 async def get_model_status():
     """FIXED: Model status endpoint"""
@@ -349,23 +886,36 @@ async def get_model_status():
 
 def clean_for_tts(text: str) -> str:
     """Clean text for TTS"""
-    import re
     # Remove emojis and markdown
-    text = re.sub(r'[🤖✅⚠️❌🛠️🟢]', '', text)
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'\n+', '. ', text)
+    text = text.translate(_TTS_EMOJI_TABLE)
+    text = _BOLD_RE.sub(r'\1', text)
+    text = _NL_RE.sub('. ', text)
     return text.strip()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FIXED Quantized LLM Backend")
+    parser.add_argument("--quantization", choices=QUANTIZATION_MODES, default=QUANTIZATION,
+                        help="weight quantization (auto = 8-bit; none to roll back to full precision)")
+    parser.add_argument("--speculative", action="store_true", default=SPECULATIVE,
+                        help=f"speculative decoding with the {DRAFT_MODEL_NAME} draft model")
+    args = parser.parse_args()
+    QUANTIZATION = args.quantization
+    SPECULATIVE = args.speculative
+    # Worker processes re-import this module, so pass the flags on via env
+    os.environ["QUANTIZATION"] = QUANTIZATION
+    os.environ["SPECULATIVE"] = str(SPECULATIVE).lower()
+    
     print("🚀 Starting FIXED Backend...")
     print("✅ All FastAPI warnings resolved")
     print("✅ Model loading with accelerate")  
     print("✅ New lifespan event handlers")
     print("✅ Proper error handling")
     
+    # Multiple workers need an import string rather than the app object
     uvicorn.run(
-        app,
+        f"{Path(__file__).stem}:app" if BACKEND_WORKERS > 1 else app,
         host="0.0.0.0", 
         port=8000,
+        workers=BACKEND_WORKERS,
         log_level="info"
     )
@@ -3,17 +3,64 @@
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-import requests
+from contextlib import asynccontextmanager
+import asyncio
+import httpx
+import json
 import time
 import re
 from datetime import datetime
+from pathlib import Path
+import sys
+
+if not __package__:
+    # Run as a script (cd src/api && python main.py): make src importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.nlp.text import count_words
+
+# Optional orjson for faster response serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 OLLAMA_HOST = "http://localhost:11434"
 DEFAULT_MODEL = "tinyllama"
+MAX_CONCURRENT_STREAMS = 16
+
+# Shared keep-alive connection pool to Ollama, closed on shutdown
+CLIENT = httpx.AsyncClient(
+    base_url=OLLAMA_HOST,
+    timeout=30.0,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+)
+
+# clean_for_voice patterns and tables, built once
+_VOICE_EMOJI_TABLE = str.maketrans("", "", "🤖🎓📚💡🔧⚡🎯📄🔍✅❌🚫👋🎤🔊")
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_SPOKEN_RE = re.compile(r'\b(?:AI|API|vs)\b|&')
+_SPOKEN = {'AI': 'A I', 'API': 'A P I', 'vs': 'versus', '&': 'and'}
+_NL_RE = re.compile(r'\n+')
+_WS_RE = re.compile(r'\s+')
+
+# Admission control for /chat/stream: each open stream holds one slot
+_stream_slots = asyncio.Semaphore(MAX_CONCURRENT_STREAMS)
 
-app = FastAPI(title="AI Study Buddy - Voice Enhanced", version="2.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await CLIENT.aclose()
+
+app = FastAPI(
+    title="AI Study Buddy - Voice Enhanced",
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,46 +93,66 @@ class VoiceChatResponse(BaseModel):
 
 def clean_for_voice(text: str) -> str:
     """Clean text for voice synthesis"""
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'\*(.*?)\*', r'\1', text) 
-    text = re.sub(r'[🤖🎓📚💡🔧⚡🎯📄🔍✅❌🚫👋🎤🔊]', '', text)
-    
-    replacements = {
-        'AI': 'A I', 'API': 'A P I', 'vs': 'versus', '&': 'and'
-    }
-    
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-    
-    text = re.sub(r'\n+', '. ', text)
-    text = re.sub(r'\s+', ' ', text)
+    text = _BOLD_RE.sub(r'\1', text)
+    text = _ITALIC_RE.sub(r'\1', text)
+    text = text.translate(_VOICE_EMOJI_TABLE)
+    text = _SPOKEN_RE.sub(lambda m: _SPOKEN[m.group(0)], text)
+    text = _NL_RE.sub('. ', text)
+    text = _WS_RE.sub(' ', text)
     return text.strip()
 
 async def get_voice_ai_response(message: str, voice_mode: bool = False):
     start_time = time.time()
     
     try:
-        response = requests.post(
-            f"{OLLAMA_HOST}/api/generate",
-            json={"model": DEFAULT_MODEL, "prompt": message, "stream": False},
-            timeout=30
+        response = await CLIENT.post(
+            "/api/generate",
+            json={"model": DEFAULT_MODEL, "prompt": message, "stream": False}
         )
         
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content) if ORJSON_AVAILABLE else response.json()
             ai_response = result.get("response", "")
             response_time = int((time.time() - start_time) * 1000)
             voice_response = clean_for_voice(ai_response)
             return ai_response, voice_response, response_time
-    except:
+    except (httpx.HTTPError, ValueError):
         pass
     
     response_time = int((time.time() - start_time) * 1000)
+    display_response, voice_response = fallback_response(message, voice_mode)
+    return display_response, voice_response, response_time
+
+async def stream_ai_response(message: str):
+    """Yield Ollama's reply piece by piece, or the fallback text if it is unreachable"""
+    streamed = False
+    try:
+        async with CLIENT.stream(
+            "POST",
+            "/api/generate",
+            json={"model": DEFAULT_MODEL, "prompt": message, "stream": True}
+        ) as response:
+            if response.status_code == 200:
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    event = orjson.loads(line) if ORJSON_AVAILABLE else json.loads(line)
+                    piece = event.get("response", "")
+                    if piece:
+                        streamed = True
+                        yield piece
+    except (httpx.HTTPError, ValueError):
+        pass
     
+    if not streamed:
+        yield fallback_response(message)[0]
+
+def fallback_response(message: str, voice_mode: bool = False) -> tuple[str, str]:
+    """Display and voice text used when Ollama can't answer"""
     if voice_mode:
         voice_response = f"Hello! I'm your A I Study Buddy. You asked about {message}. I'm here to help you learn any subject. Whether it's math, science, history, or languages, I can explain concepts, provide study tips, and help you understand difficult topics. What would you like to learn about today?"
         display_response = f"🎤 **Voice Response**\n\n{voice_response}\n\n🔧 *Voice-optimized educational response*"
-        return display_response, voice_response, response_time
+        return display_response, voice_response
     else:
         fallback = f"""🤖 **AI Study Buddy**
 
@@ -103,7 +170,7 @@ I'm here to help you learn and understand any topic!
 **🎓 Keep studying - you're doing great!**
 """
         voice_version = clean_for_voice(fallback)
-        return fallback, voice_version, response_time
+        return fallback, voice_version
 
 @app.get("/")
 async def root():
@@ -143,11 +210,28 @@ async def voice_chat(chat_message: VoiceChatMessage):
         metadata={"voice_mode": chat_message.voice_mode}
     )
 
+@app.post("/chat/stream")
+async def voice_chat_stream(chat_message: VoiceChatMessage):
+    """Stream the reply as plain text while it is generated
+    
+    /chat stays the non-streaming endpoint for voice mode, where
+    clean_for_voice needs the whole answer.
+    """
+    if _stream_slots.locked():
+        raise HTTPException(status_code=503, detail="Too many concurrent chats, please retry shortly")
+    
+    async def body():
+        async with _stream_slots:
+            async for piece in stream_ai_response(chat_message.message):
+                yield piece
+    
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
+
 @app.post("/documents")
 async def upload_document(document: dict):
     filename = document.get("filename", "document.txt")
     content = document.get("content", "")
-    words = len(content.split()) if content else 0
+    words = count_words(content)
     
     return {
         "id": 1,
@@ -184,4 +268,9 @@ async def ui():
 if __name__ == "__main__":
     import uvicorn
     print("🎤 Starting Voice-Enhanced AI Study Buddy!")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(
+        "src.api.main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True
+    )
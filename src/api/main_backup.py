@@ -3,18 +3,50 @@
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse
 from pydantic import BaseModel
-import requests
+from contextlib import asynccontextmanager
+import httpx
 import time
 from datetime import datetime
+from pathlib import Path
+import sys
+
+if not __package__:
+    # Run as a script (cd src/api && python main.py): make src importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from src.nlp.text import count_words
+
+# Optional orjson for faster response serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 # Simple config
 OLLAMA_HOST = "http://localhost:11434"
 DEFAULT_MODEL = "tinyllama"
 
+# Shared keep-alive connection pool to Ollama, closed on shutdown
+CLIENT = httpx.AsyncClient(
+    base_url=OLLAMA_HOST,
+    timeout=30.0,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await CLIENT.aclose()
+
 # FastAPI app
-app = FastAPI(title="AI Study Buddy", version="1.0.0")
+app = FastAPI(
+    title="AI Study Buddy",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
+)
 
 # CORS
 app.add_middleware(
@@ -50,18 +82,17 @@ async def get_ai_response(message: str) -> tuple[str, int]:
     start_time = time.time()
     
     try:
-        response = requests.post(
-            f"{OLLAMA_HOST}/api/generate",
-            json={"model": DEFAULT_MODEL, "prompt": message, "stream": False},
-            timeout=30
+        response = await CLIENT.post(
+            "/api/generate",
+            json={"model": DEFAULT_MODEL, "prompt": message, "stream": False}
         )
         
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content) if ORJSON_AVAILABLE else response.json()
             ai_response = result.get("response", "No response")
             response_time = int((time.time() - start_time) * 1000)
             return ai_response, response_time
-    except:
+    except (httpx.HTTPError, ValueError):
         pass
     
     # Fallback response
@@ -130,7 +161,7 @@ async def upload_document(document: dict):
     filename = document.get("filename", "document.txt")
     content = document.get("content", "")
     
-    words = len(content.split()) if content else 0
+    words = count_words(content)
     
     return {
         "id": 1,
@@ -185,4 +216,9 @@ async def ui():
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Starting AI Study Buddy - Simple Working Backend!")
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(
+        "src.api.main_backup:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True
+    )
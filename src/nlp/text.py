@@ -0,0 +1,15 @@
+"""Lightweight text helpers shared by the backends (standard library only)"""
+
+import re
+
+_NON_SPACE_RE = re.compile(r"\S+")
+
+def count_words(text: str) -> int:
+    """Whitespace-separated word count without building a list of words
+
+    Gives the same count as len(text.split()): the pattern runs in Unicode
+    mode, so non-ASCII whitespace such as NBSP or U+3000 separates words too.
+    """
+    if not text:
+        return 0
+    return sum(1 for _ in _NON_SPACE_RE.finditer(text))
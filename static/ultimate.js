@@ -0,0 +1,417 @@
+console.log('🚀 Initializing FIXED Ultimate Voice System...');
+
+// Trailing-edge debounce: only the last call within `wait` ms runs
+function debounce(fn, wait) {
+    let timer;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn(...args), wait);
+    };
+}
+
+// Coalesce rapid voice results into a single Gradio input update
+const fireInput = debounce(el => el.dispatchEvent(new Event('input', { bubbles: true })), 350);
+
+let recognition = null;
+let synthesis = window.speechSynthesis;
+let isListening = false;
+let voices = [];
+let preferredVoice = null;
+// Length + FNV-1a hash of the last spoken TTS text, instead of keeping a copy
+let lastTTSLen = 0;
+let lastTTSHash = 0;
+
+// Cached DOM references, resolved once Gradio has mounted the components
+let chatTextarea = null;
+let statusEls = null;
+let voiceBtn = null;
+
+const languages = {
+    'en': { code: 'en-US', name: 'English', flag: '🇺🇸' },
+    'ta': { code: 'ta-IN', name: 'Tamil', flag: '🇮🇳' },
+    'hi': { code: 'hi-IN', name: 'Hindi', flag: '🇮🇳' },
+    'es': { code: 'es-ES', name: 'Spanish', flag: '🇪🇸' },
+    'fr': { code: 'fr-FR', name: 'French', flag: '🇫🇷' },
+    'de': { code: 'de-DE', name: 'German', flag: '🇩🇪' }
+};
+
+function initFixedVoice() {
+    console.log('🎤 Setting up fixed voice recognition...');
+
+    // Chrome fills the voice list asynchronously - listen until it arrives
+    synthesis.onvoiceschanged = loadVoices;
+    loadVoices();
+
+    if ('webkitSpeechRecognition' in window || 'SpeechRecognition' in window) {
+        const SpeechRecognition = window.webkitSpeechRecognition || window.SpeechRecognition;
+        recognition = new SpeechRecognition();
+        setupFixedRecognition();
+    } else {
+        console.warn('⚠️ Speech recognition not supported');
+        updateVoiceStatus('❌ Voice not supported - Please use Chrome or Edge', 'error');
+        return false;
+    }
+
+    console.log('✅ Fixed voice system ready!');
+    updateVoiceStatus('🎤 Fixed voice ready - Click to start!', 'ready');
+    return true;
+}
+
+function loadVoices() {
+    voices = synthesis.getVoices();
+    preferredVoice = voices.find(v => v.lang.startsWith('en') && v.default) || voices[0] || null;
+    console.log(`🎙️ Loaded ${voices.length} voices for TTS`);
+    if (voices.length > 0) {
+        synthesis.onvoiceschanged = null;
+    }
+}
+
+function setupFixedRecognition() {
+    recognition.continuous = false;
+    recognition.interimResults = true;
+    recognition.lang = 'en-US';
+
+    recognition.onstart = function() {
+        console.log('🎤 Fixed voice recognition started');
+        isListening = true;
+        updateVoiceButton('listening');
+        updateVoiceStatus('🎤 Listening... Speak clearly!', 'listening');
+    };
+
+    recognition.onresult = function(event) {
+        let finalTranscript = '';
+
+        for (let i = event.resultIndex; i < event.results.length; i++) {
+            if (event.results[i].isFinal) {
+                finalTranscript += event.results[i][0].transcript;
+            }
+        }
+
+        if (finalTranscript) {
+            console.log(`✅ Recognized: "${finalTranscript}"`);
+            fillMessageInput(finalTranscript);
+            updateVoiceStatus(`✅ Got it: "${finalTranscript}"`, 'success');
+        }
+    };
+
+    recognition.onerror = function(event) {
+        console.error('❌ Voice recognition error:', event.error);
+        isListening = false;
+        updateVoiceButton('error');
+        updateVoiceStatus(`❌ Voice error: ${event.error}`, 'error');
+    };
+
+    recognition.onend = function() {
+        console.log('🏁 Voice recognition ended');
+        isListening = false;
+        updateVoiceButton('ready');
+        updateVoiceStatus('🎤 Click microphone to speak again', 'ready');
+    };
+}
+
+function startFixedVoice() {
+    if (!recognition) {
+        initFixedVoice();
+        return;
+    }
+
+    if (isListening) {
+        recognition.stop();
+        return;
+    }
+
+    // The user is talking again - stop reading out the previous reply
+    stopSpeech();
+
+    try {
+        recognition.start();
+        updateVoiceStatus('🎤 Starting voice recognition...', 'starting');
+    } catch (error) {
+        console.error('❌ Failed to start voice recognition:', error);
+        updateVoiceStatus('❌ Could not start voice input', 'error');
+    }
+}
+
+// Sentence-level TTS pipeline: the first sentence starts playing while the
+// rest of the reply is still queued (or still arriving)
+let ttsQueue = [];
+let ttsSpeaking = false;
+// Aborted when a reply is interrupted, so late callbacks from it are ignored
+let ttsController = new AbortController();
+
+function splitSentences(text) {
+    return text.match(/[^.!?]+[.!?]+|\S.+$/g) || [text];
+}
+
+// Finished utterances are reused - only the text/voice fields change per sentence
+const utterancePool = [];
+
+function getUtterance() {
+    return utterancePool.pop() || new SpeechSynthesisUtterance();
+}
+
+function releaseUtterance(utterance) {
+    // Clear handlers first so a late onerror after onend can't release twice
+    utterance.onstart = utterance.onend = utterance.onerror = null;
+    utterancePool.push(utterance);
+}
+
+function pumpSpeech() {
+    const sentence = ttsQueue.shift();
+    if (sentence === undefined) {
+        ttsSpeaking = false;
+        updateVoiceStatus('🎤 Click microphone to continue', 'ready');
+        return;
+    }
+
+    ttsSpeaking = true;
+    const signal = ttsController.signal;
+    const utterance = getUtterance();
+    utterance.text = sentence;
+    utterance.rate = 0.9;
+    utterance.pitch = 1.0;
+    utterance.volume = 1.0;
+    utterance.voice = preferredVoice;
+
+    utterance.onstart = () => updateVoiceStatus('🔊 AI is speaking...', 'speaking');
+    utterance.onend = utterance.onerror = () => {
+        releaseUtterance(utterance);
+        // A cancelled utterance must not pull the next reply's queue forward
+        if (!signal.aborted) pumpSpeech();
+    };
+
+    synthesis.speak(utterance);
+}
+
+function stopSpeech() {
+    ttsController.abort();
+    ttsController = new AbortController();
+    ttsQueue = [];
+    ttsSpeaking = false;
+    // cancel() is a blocking platform call - skip it when nothing is queued
+    if (synthesis.speaking || synthesis.pending) {
+        synthesis.cancel();
+    }
+}
+
+// Bounded LRU of recently spoken text, keyed by SHA-256 of the normalized
+// text. Web Speech gives us no audio to replay, so it only guards against
+// re-speaking the same text back-to-back.
+const TTS_CACHE_SIZE = 50;
+const TTS_REPEAT_WINDOW_MS = 5000;
+const ttsCache = new Map();
+let ttsChain = Promise.resolve();
+
+async function ttsKey(text) {
+    const normalized = text.trim().toLowerCase();
+    // crypto.subtle only exists in secure contexts (https or localhost)
+    if (!window.crypto?.subtle) return normalized;
+    const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(normalized));
+    return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+}
+
+function recentlySpoken(key) {
+    const now = Date.now();
+    const last = ttsCache.get(key);
+    ttsCache.delete(key);
+    ttsCache.set(key, now);
+    if (ttsCache.size > TTS_CACHE_SIZE) {
+        ttsCache.delete(ttsCache.keys().next().value);
+    }
+    return last !== undefined && now - last < TTS_REPEAT_WINDOW_MS;
+}
+
+function speakFixedText(text) {
+    if (!text || !text.trim()) return;
+
+    // Chain so hashing never reorders queued text
+    const signal = ttsController.signal;
+    ttsChain = ttsChain.then(async () => {
+        const key = await ttsKey(text);
+        // Text from a reply interrupted while it was being hashed is dropped
+        if (signal.aborted || recentlySpoken(key)) return;
+
+        console.log('🔊 Speaking:', text.substring(0, 50) + '...');
+
+        for (const sentence of splitSentences(text)) {
+            if (sentence.trim()) ttsQueue.push(sentence.trim());
+        }
+        if (!ttsSpeaking) pumpSpeech();
+    }).catch(error => console.error('❌ TTS error:', error));
+}
+
+const CHAT_LABEL_RE = /chat/i;
+const ASK_PLACEHOLDER_RE = /ask/i;
+
+function findChatTextarea() {
+    // Fallback when the elem_id is missing: match by label/placeholder.
+    // Only runs when the cached reference is empty or detached.
+    for (const textarea of document.querySelectorAll('textarea')) {
+        const label = textarea.parentElement?.querySelector('label')?.textContent || '';
+        if (CHAT_LABEL_RE.test(label) || ASK_PLACEHOLDER_RE.test(textarea.placeholder || '')) {
+            return textarea;
+        }
+    }
+    return null;
+}
+
+function cacheDomRefs() {
+    // Re-resolve only if Gradio has replaced the nodes since the last lookup
+    if (!chatTextarea?.isConnected) {
+        chatTextarea = document.querySelector('#chat-input textarea') || findChatTextarea();
+    }
+    if (!voiceBtn?.isConnected) {
+        voiceBtn = document.getElementById('fixed-voice-btn');
+    }
+    if (!statusEls?.length || !statusEls[0].isConnected) {
+        statusEls = document.querySelectorAll('.voice-status');
+    }
+}
+
+function updateVoiceButton(state) {
+    cacheDomRefs();
+    const btn = voiceBtn;
+    if (!btn) return;
+
+    btn.className = 'ultimate-voice-btn';
+
+    switch(state) {
+        case 'listening':
+            btn.className += ' listening';
+            btn.innerHTML = '🔴';
+            btn.title = 'Listening... Click to stop';
+            break;
+        case 'error':
+            btn.innerHTML = '❌';
+            btn.title = 'Voice error - Click to retry';
+            break;
+        case 'ready':
+        default:
+            btn.className += ' animate-float';
+            btn.innerHTML = '🎤';
+            btn.title = 'Click to start voice input';
+            break;
+    }
+}
+
+function updateVoiceStatus(message, type = 'info') {
+    cacheDomRefs();
+    statusEls.forEach(element => {
+        element.textContent = message;
+        element.className = `voice-status ${type}`;
+    });
+    console.log(`Voice Status:`, message);
+}
+
+function fillMessageInput(text) {
+    cacheDomRefs();
+    const textarea = chatTextarea;
+    if (!textarea) return;
+
+    textarea.value = text;
+    fireInput(textarea);
+    textarea.focus();
+
+    // Visual feedback
+    textarea.style.background = 'rgba(79, 172, 254, 0.2)';
+    setTimeout(() => {
+        textarea.style.background = '';
+    }, 2000);
+}
+
+// Auto-speak TTS responses - react to changes of the hidden TTS textbox
+function fnv1a(str) {
+    let hash = 2166136261 >>> 0;
+    for (let i = 0; i < str.length; i++) {
+        hash ^= str.charCodeAt(i);
+        hash = Math.imul(hash, 16777619) >>> 0;
+    }
+    return hash;
+}
+
+function checkTTSOutput(ttsEl) {
+    const value = ttsEl.value;
+    if (!value || value.length <= 20) return;
+
+    const hash = fnv1a(value);
+    if (value.length === lastTTSLen && hash === lastTTSHash) return;
+
+    if (lastTTSLen && value.length > lastTTSLen &&
+        fnv1a(value.slice(0, lastTTSLen)) === lastTTSHash) {
+        // Same reply grew - only queue the new tail
+        speakFixedText(value.slice(lastTTSLen));
+    } else {
+        // A new reply replaces whatever is still being read out
+        stopSpeech();
+        speakFixedText(value);
+    }
+    lastTTSLen = value.length;
+    lastTTSHash = hash;
+}
+
+// Fallback for browsers without MutationObserver: a self-rescheduling
+// timeout, so a slow check never stacks up back-to-back callbacks
+let ttsPollHandle = null;
+
+function pollTTSOutput(ttsEl) {
+    (function loop() {
+        try {
+            checkTTSOutput(ttsEl);
+        } finally {
+            ttsPollHandle = setTimeout(loop, 2000);
+        }
+    })();
+}
+
+function watchTTSOutput() {
+    const wrapper = document.getElementById('tts-hidden');
+    const ttsEl = wrapper?.querySelector('textarea');
+    if (!ttsEl) {
+        // Gradio mounts components after DOMContentLoaded
+        ttsPollHandle = setTimeout(watchTTSOutput, 500);
+        return;
+    }
+
+    if (!('MutationObserver' in window)) {
+        pollTTSOutput(ttsEl);
+        return;
+    }
+
+    // Gradio resizes the textarea (style attribute) whenever its value is set
+    new MutationObserver(() => checkTTSOutput(ttsEl)).observe(wrapper, {
+        attributes: true, childList: true, characterData: true, subtree: true
+    });
+    ttsEl.addEventListener('input', () => checkTTSOutput(ttsEl));
+}
+
+window.addEventListener('pagehide', () => clearTimeout(ttsPollHandle));
+
+// Initialize once per page; Blocks(js=...) and the end of this file both call it
+let interfaceInitialized = false;
+
+function initUltimateInterface() {
+    if (interfaceInitialized) return;
+    interfaceInitialized = true;
+
+    console.log('🎓 Fixed interface loaded');
+    cacheDomRefs();
+    watchTTSOutput();
+    // Set up voices when the browser is idle, not during first paint/hydration
+    const whenIdle = 'requestIdleCallback' in window
+        ? (cb, opts) => requestIdleCallback(cb, opts)
+        : cb => setTimeout(cb, 1500);
+    whenIdle(() => {
+        if (initFixedVoice()) {
+            updateVoiceStatus('🚀 Fixed voice system ready!', 'ready');
+        }
+    }, { timeout: 2000 });
+}
+
+window.initUltimateInterface = initUltimateInterface;
+
+// Gradio inserts this script asynchronously, so the js= hook often runs
+// before it exists; start here as well - watchTTSOutput waits for the mount
+initUltimateInterface();
+
+window.startFixedVoice = startFixedVoice;
+console.log('🎉 Fixed Ultimate Voice System loaded!');
@@ -26,7 +26,7 @@ echo -e "${BLUE}📦 Step 2: Installing better model packages...${NC}"
 source quantized-llm-env/bin/activate
 
 # Install better packages for enhanced models
-pip install --upgrade transformers torch accelerate sentence-transformers
+pip install --upgrade transformers torch accelerate sentence-transformers bitsandbytes
 
 echo -e "${BLUE}🧠 Step 3: Setting up MUCH better models...${NC}"
 